@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 import environ
 
@@ -30,11 +31,37 @@ DATABASES = {
         "NAME": env("POSTGRES_DB", default="clearops_db"),
         "USER": env("POSTGRES_USER", default="clearops_user"),
         "PASSWORD": env("POSTGRES_PASSWORD", default="securepassword"),
-        "HOST": env("POSTGRES_HOSTs", default="localhost"),
+        "HOST": env("POSTGRES_HOST", default="localhost"),
         "PORT": env("POSTGRES_PORT", default="5432"),
+        # Keep connections open between requests (per worker thread) and
+        # check them before reuse, so a restarted database is survived.
+        "CONN_MAX_AGE": env.int("DJANGO_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# psycopg 3 connection pool, shared by the threads of a worker process. Use it
+# when serving ASGI, where sync code runs on short-lived threads that would
+# otherwise each hold a persistent connection. Replaces CONN_MAX_AGE.
+if env.bool("POSTGRES_POOL", default=False):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("POSTGRES_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("POSTGRES_POOL_MAX_SIZE", default=10),
+            "timeout": env.int("POSTGRES_POOL_TIMEOUT", default=10),
+        }
+    }
+
+# Cache shared by every worker process: the rate cache version, close job
+# progress, Idempotency-Key replays, cached responses and the metrics of
+# other workers all live here. The local-memory default only suits a single
+# process (runserver, tests); gunicorn.conf.py refuses to start several
+# workers on it. docker-compose.yml points this at its Redis service; a
+# database cache (dbcache://payroll_cache after ``manage.py createcachetable``)
+# also works, at the price of queries on every rate lookup and cached read.
+CACHES = {"default": env.cache_url("DJANGO_CACHE_URL", default="locmemcache://")}
+
 # Application definition
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -50,6 +77,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "payroll.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -119,3 +147,38 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Payroll background jobs (see payroll/jobs.py)
+PAYROLL_JOB_WORKERS = env.int("PAYROLL_JOB_WORKERS", default=2)
+PAYROLL_JOBS_EAGER = env.bool("PAYROLL_JOBS_EAGER", default=False)
+# Seconds without a heartbeat after which a queued or running job is failed
+PAYROLL_JOB_TIMEOUT = env.int("PAYROLL_JOB_TIMEOUT", default=600)
+# Worker processes per server process for close jobs (0: PAYROLL_JOB_WORKERS
+# threads). Needs a shared cache (DJANGO_CACHE_URL) for job progress.
+PAYROLL_JOB_PROCESSES = env.int("PAYROLL_JOB_PROCESSES", default=0)
+# Runs closed concurrently by the close_payroll_runs command, each in its own
+# worker process and DB connection (the close-batch endpoint queues jobs).
+PAYROLL_BATCH_CLOSE_WORKERS = env.int(
+    "PAYROLL_BATCH_CLOSE_WORKERS", default=os.cpu_count() or 4
+)
+
+# Seconds a bulk work entry response is kept for Idempotency-Key retries
+PAYROLL_IDEMPOTENCY_TTL = env.int("PAYROLL_IDEMPOTENCY_TTL", default=900)
+# Seconds a key stays "in progress" (409 to retries) if its request never
+# finishes; keep it above the slowest bulk upload (GUNICORN_TIMEOUT).
+PAYROLL_IDEMPOTENCY_PENDING_TTL = env.int("PAYROLL_IDEMPOTENCY_PENDING_TTL", default=120)
+
+# Seconds serialized API responses are cached by ETag (see payroll/conditional.py)
+PAYROLL_RESPONSE_CACHE_TTL = env.int("PAYROLL_RESPONSE_CACHE_TTL", default=300)
+
+# Employee pay rate cache (see payroll/rates.py)
+PAYROLL_RATE_CACHE_SIZE = env.int("PAYROLL_RATE_CACHE_SIZE", default=10_000)
+PAYROLL_RATE_CACHE_ALIAS = env.str("PAYROLL_RATE_CACHE_ALIAS", default="default")
+
+# Most scenarios one what-if simulation request may ask for (see payroll/simulation.py)
+PAYROLL_SIMULATION_MAX_SCENARIOS = env.int("PAYROLL_SIMULATION_MAX_SCENARIOS", default=1000)
+
+# Payroll API metrics (see payroll/metrics.py)
+PAYROLL_METRICS_ENABLED = env.bool("PAYROLL_METRICS_ENABLED", default=False)
+PAYROLL_METRICS_SAMPLE_RATE = env.float("PAYROLL_METRICS_SAMPLE_RATE", default=1.0)
+PAYROLL_METRICS_SERVER_TIMING = env.bool("PAYROLL_METRICS_SERVER_TIMING", default=True)
@@ -1,7 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from payroll.health import health_view, ready_view
+from payroll.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("payroll.urls")),
+    path("metrics", metrics_view, name="metrics"),
+    path("healthz", health_view, name="healthz"),
+    path("readyz", ready_view, name="readyz"),
 ]
@@ -0,0 +1,55 @@
+# clearops/backend/gunicorn.conf.py
+"""
+Production serving profile, read by ``gunicorn`` from the working directory.
+
+    DJANGO_SERVER      -- "wsgi" (default): config.wsgi on threaded workers;
+                          "asgi": config.asgi on uvicorn workers (set
+                          POSTGRES_POOL=true, see config/settings.py)
+    GUNICORN_BIND      -- address to listen on (default 0.0.0.0:8000)
+    GUNICORN_WORKERS   -- worker processes (default 2 x CPUs + 1)
+    GUNICORN_THREADS   -- threads per WSGI worker (default 4)
+    GUNICORN_TIMEOUT   -- seconds before a silent worker is restarted (default 60)
+    GUNICORN_MAX_REQUESTS -- requests before a worker is recycled (default 5000)
+    DJANGO_CACHE_URL   -- shared cache, required with more than one worker
+                          (see CACHES in config/settings.py)
+
+Workers are recycled after a jittered number of requests, so in-process
+caches and any slow leaks are bounded without all workers restarting at once.
+State that must agree across workers goes through the shared cache, so
+several workers on a process-local cache are refused at startup.
+
+Streaming responses suit both modes: exports are fed to Django as a sync
+iterator under WSGI and as an async one under ASGI (see payroll/streaming.py).
+"""
+import multiprocessing
+import os
+
+server = os.environ.get("DJANGO_SERVER", "wsgi").lower()
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+
+cache_url = os.environ.get("DJANGO_CACHE_URL", "locmemcache://")
+if workers > 1 and cache_url.split(":", 1)[0] in ("locmemcache", "dummycache"):
+    raise RuntimeError(
+        f"{workers} workers need a shared cache; set DJANGO_CACHE_URL, "
+        "e.g. redis://cache:6379/0 (see config/settings.py)"
+    )
+
+if server == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "config.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+accesslog = "-"
+errorlog = "-"
+# Log the request duration in microseconds (%(D)s) alongside the usual fields.
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)sus'
@@ -1,10 +1,41 @@
+from django import forms
 from django.contrib import admin
 
-from .models import Employee, WorkEntry, PayrollRun
+from .models import (
+    DeductionRule,
+    Employee,
+    EmployeeRate,
+    WorkEntry,
+    PayrollRun,
+    PayrollCloseJob,
+    PayrollAuditEvent,
+)
+from .deductions import compile_rule
+from .services import delete_with_entries
+from .totals import refresh_totals_for
+
+
+class EmployeeRateInline(admin.TabularInline):
+    model = EmployeeRate
+    fields = ("effective_from", "worker_type", "hourly_rate", "daily_rate", "created_at")
+    readonly_fields = ("created_at",)
+    extra = 0
+
+
+class DeleteWithEntriesMixin:
+    """Deletes refresh the totals fed by the cascaded work entries."""
+
+    def delete_model(self, request, obj):
+        delete_with_entries(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            delete_with_entries(obj)
 
 
 @admin.register(Employee)
-class EmployeeAdmin(admin.ModelAdmin):
+class EmployeeAdmin(DeleteWithEntriesMixin, admin.ModelAdmin):
+    inlines = [EmployeeRateInline]
     list_display = (
         "first_name",
         "last_name",
@@ -36,9 +67,33 @@ class WorkEntryAdmin(admin.ModelAdmin):
     )
     search_fields = ("employee__first_name", "employee__last_name")
 
+    def save_model(self, request, obj, form, change):
+        previous = []
+        if change:
+            previous = [
+                (
+                    form.initial.get("employee"),
+                    form.initial.get("payroll_run"),
+                    form.initial.get("payroll_period_start"),
+                )
+            ]
+        super().save_model(request, obj, form, change)
+        refresh_totals_for(previous + [obj])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_totals_for([obj])
+
+    def delete_queryset(self, request, queryset):
+        entries = list(
+            queryset.values_list("employee_id", "payroll_run_id", "payroll_period_start")
+        )
+        super().delete_queryset(request, queryset)
+        refresh_totals_for(entries)
+
 
 @admin.register(PayrollRun)
-class PayrollRunAdmin(admin.ModelAdmin):
+class PayrollRunAdmin(DeleteWithEntriesMixin, admin.ModelAdmin):
     list_display = (
         "id",
         "payroll_period_start",
@@ -47,3 +102,63 @@ class PayrollRunAdmin(admin.ModelAdmin):
     )
     list_filter = ("payroll_period_start", "payroll_period_end", "date_processed")
     search_fields = ("payroll_period_start", "payroll_period_end")
+
+
+@admin.register(PayrollCloseJob)
+class PayrollCloseJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "payroll_run",
+        "status",
+        "entries_processed",
+        "entries_total",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+
+
+class DeductionRuleForm(forms.ModelForm):
+    class Meta:
+        model = DeductionRule
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        rule = DeductionRule(
+            **{
+                field: cleaned_data.get(field)
+                for field in ("kind", "base", "rate", "amount", "brackets", "cap")
+            }
+        )
+        try:
+            compile_rule(rule)
+        except ValueError as exc:
+            raise forms.ValidationError(str(exc))
+        return cleaned_data
+
+
+@admin.register(DeductionRule)
+class DeductionRuleAdmin(admin.ModelAdmin):
+    form = DeductionRuleForm
+    list_display = ("name", "kind", "worker_type", "base", "order", "is_active", "updated_at")
+    list_filter = ("kind", "worker_type", "is_active")
+    list_editable = ("order", "is_active")
+    search_fields = ("name",)
+
+
+@admin.register(PayrollAuditEvent)
+class PayrollAuditEventAdmin(admin.ModelAdmin):
+    # Plain ids: the referenced rows may be gone, and no per-row lookups.
+    list_display = ("id", "action", "payroll_run_id", "employee_id", "work_entry_id", "created_at")
+    list_filter = ("action",)
+    readonly_fields = ("action", "payroll_run", "employee", "work_entry", "changes", "created_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,116 @@
+# clearops/backend/payroll/analytics.py
+"""
+Labour cost and headcount reports over work entries.
+
+A report is one grouped aggregate query: entries whose period starts in the
+requested range are bucketed by any of the DIMENSIONS (calendar week or
+month of the period start, worker type, employee, payroll run) and summed in
+the database. ``employees`` is the number of distinct employees paid in a
+group, i.e. the headcount trend when grouped by week or month. The range
+filter is served by the (payroll_period_start, payroll_period_end) index.
+
+Reports limited to closed runs (``closed=True``) only change when a closed
+run or an employee does, so their versions -- see ``report_versions`` -- are
+cheap to read and the view serves them through ``conditional_response``.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+from .conditional import write_version
+from .models import Employee, PayrollRun, WorkEntry
+
+# Output columns of each dimension; those not on WorkEntry are annotated.
+DIMENSIONS = {
+    "week": ["week"],
+    "month": ["month"],
+    "worker_type": ["worker_type"],
+    "employee": ["employee_id", "first_name", "last_name"],
+    "payroll_run": ["payroll_run_id"],
+}
+
+COLUMNS = {
+    "week": TruncWeek("payroll_period_start"),
+    "month": TruncMonth("payroll_period_start"),
+    "worker_type": F("employee__worker_type"),
+    "first_name": F("employee__first_name"),
+    "last_name": F("employee__last_name"),
+}
+
+MONEY_FIELDS = ["gross_pay", "total_deductions", "net_pay"]
+
+
+def _aggregates():
+    zero = Value(Decimal("0.00"))
+    return {
+        "entries": Count("id"),
+        "employees": Count("employee_id", distinct=True),
+        "hours_worked": Coalesce(Sum("hours_worked"), zero),
+        "days_worked": Coalesce(Sum("days_worked"), zero),
+        **{field: Coalesce(Sum(field), zero) for field in MONEY_FIELDS},
+    }
+
+
+def report_rows(start, end, group_by=(), worker_type=None, employee=None,
+                payroll_run=None, closed=None):
+    """Rows of ``labour_cost_report`` as dicts, from one aggregate query."""
+    entries = WorkEntry.objects.filter(
+        payroll_period_start__gte=start, payroll_period_start__lte=end
+    )
+    if worker_type is not None:
+        entries = entries.filter(employee__worker_type=worker_type)
+    if employee is not None:
+        entries = entries.filter(employee_id=employee)
+    if payroll_run is not None:
+        entries = entries.filter(payroll_run_id=payroll_run)
+    if closed is True:
+        entries = entries.filter(payroll_run__is_closed=True)
+    elif closed is False:
+        entries = entries.filter(Q(payroll_run__isnull=True) | Q(payroll_run__is_closed=False))
+
+    columns = [column for dimension in group_by for column in DIMENSIONS[dimension]]
+    if not columns:
+        return [entries.aggregate(**_aggregates())]
+    return (
+        entries.annotate(**{c: COLUMNS[c] for c in columns if c in COLUMNS})
+        .values(*columns)
+        .annotate(**_aggregates())
+        .order_by(*columns)
+    )
+
+
+def _format(value):
+    if isinstance(value, Decimal):
+        return f"{value:.2f}"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def labour_cost_report(start, end, group_by=(), **filters):
+    """
+    Labour cost of entries with a period starting between ``start`` and
+    ``end`` (inclusive), one row per combination of ``group_by`` values.
+    """
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": list(group_by),
+        "rows": [
+            {key: _format(value) for key, value in row.items()}
+            for row in report_rows(start, end, group_by, **filters)
+        ],
+    }
+
+
+def report_versions():
+    """
+    Version of every closed-run report: closed runs (count, last change,
+    last totals refresh, which follows any edit of their entries) and
+    employees (names and worker types are grouped on).
+    """
+    runs = PayrollRun.objects.filter(is_closed=True).aggregate(
+        count=Count("pk"), last=Max("updated_at"), totals=Max("totals__updated_at")
+    )
+    return [(runs["count"], runs["last"], runs["totals"]), write_version(Employee)]
@@ -0,0 +1,59 @@
+# clearops/backend/payroll/audit.py
+"""
+Buffered writes to the append-only payroll audit log (PayrollAuditEvent).
+
+A write path collects its events in an AuditBuffer -- plain objects in
+memory, no queries -- and ``flush()`` inserts them with ``bulk_create`` in
+batches of AUDIT_BATCH_SIZE, as the last step of its transaction. Closing a
+run therefore adds a handful of INSERTs instead of one write per entry, and
+the events commit or roll back together with the payroll change they
+describe: a failed insert fails the close, so the log has no gaps.
+"""
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import PayrollAuditEvent
+
+AUDIT_BATCH_SIZE = 1000
+PAY_FIELDS = ["gross_pay", "total_deductions", "net_pay"]
+
+
+def _json(value):
+    if isinstance(value, Decimal):
+        return f"{value:.2f}"
+    return value
+
+
+def diff(before, after):
+    """``{field: [before, after]}`` for the fields whose value changed."""
+    return {
+        field: [_json(before.get(field)), _json(value)]
+        for field, value in after.items()
+        if _json(before.get(field)) != _json(value)
+    }
+
+
+class AuditBuffer:
+    def __init__(self):
+        self.events = []
+        self.now = timezone.now()
+
+    def __len__(self):
+        return len(self.events)
+
+    def record(self, action, changes=None, **refs):
+        """
+        Buffers one event; ``refs`` are ``payroll_run_id``, ``employee_id``
+        and ``work_entry_id``.
+        """
+        self.events.append(
+            PayrollAuditEvent(
+                action=action, changes=changes or {}, created_at=self.now, **refs
+            )
+        )
+
+    def flush(self):
+        """Writes the buffered events; call it inside the write's transaction."""
+        events, self.events = self.events, []
+        PayrollAuditEvent.objects.bulk_create(events, batch_size=AUDIT_BATCH_SIZE)
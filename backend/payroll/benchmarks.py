@@ -0,0 +1,281 @@
+# clearops/backend/payroll/benchmarks.py
+"""
+Synthetic payroll data and a benchmark harness for the hot payroll paths.
+
+Everything runs through the ORM and the Django test client, so it works on
+SQLite or a local PostgreSQL without any other services.
+"""
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client, override_settings
+
+from .ingest import ingest_work_entries, iter_ndjson_rows
+from .models import Employee, EmployeeRate, PayrollRun, WorkEntry
+from .services import calculate_payroll, calculate_payroll_per_employee, close_payroll_run
+from .totals import rebuild_totals
+
+FIRST_NAMES = ["Alex", "Sam", "Maria", "Jun", "Priya", "Luis", "Ana", "Omar", "Kim", "Noah"]
+LAST_NAMES = ["Jaelson", "Garcia", "Nguyen", "Okafor", "Silva", "Kowalski", "Haddad", "Lee"]
+DEFAULT_FIRST_PERIOD_START = date(2024, 1, 1)
+# Cases only run when asked for by name: the per-employee reference loop
+# issues queries per employee.
+OPT_IN_CASES = {"calculate_payroll_per_employee"}
+
+
+def generate_payroll_data(
+    employees,
+    periods,
+    seed=0,
+    daily_ratio=0.3,
+    inactive_ratio=0.0,
+    first_period_start=None,
+    batch_size=5000,
+):
+    """
+    Creates ``employees`` employees with an opening rate and one weekly
+    PayrollRun per period with a work entry per employee, deterministically
+    from ``seed``. Deactivated staff only have entries for the first half of
+    the periods, as if they left mid-way. The periods start the day after
+    the latest existing run unless ``first_period_start`` is given
+    (DEFAULT_FIRST_PERIOD_START on an empty database). Returns the created
+    runs, oldest first.
+    """
+    if first_period_start is None:
+        latest = PayrollRun.objects.aggregate(end=Max("payroll_period_end"))["end"]
+        first_period_start = (
+            DEFAULT_FIRST_PERIOD_START if latest is None else latest + timedelta(days=1)
+        )
+    rng = random.Random(seed)
+
+    staff = []
+    for i in range(employees):
+        daily = rng.random() < daily_ratio
+        staff.append(
+            Employee(
+                first_name=f"{rng.choice(FIRST_NAMES)}{i}",
+                last_name=rng.choice(LAST_NAMES),
+                worker_type="daily" if daily else "hourly",
+                hourly_rate=None if daily else Decimal(rng.randrange(1500, 3500)) / 100,
+                daily_rate=Decimal(rng.randrange(12000, 26000)) / 100 if daily else None,
+                is_active=rng.random() >= inactive_ratio,
+            )
+        )
+    staff = Employee.objects.bulk_create(staff, batch_size=batch_size)
+    EmployeeRate.objects.bulk_create(
+        (
+            EmployeeRate(
+                employee=employee,
+                worker_type=employee.worker_type,
+                hourly_rate=employee.hourly_rate,
+                daily_rate=employee.daily_rate,
+                effective_from=first_period_start,
+            )
+            for employee in staff
+        ),
+        batch_size=batch_size,
+    )
+
+    runs = PayrollRun.objects.bulk_create(
+        [
+            PayrollRun(
+                payroll_period_start=first_period_start + timedelta(weeks=week),
+                payroll_period_end=first_period_start + timedelta(weeks=week, days=6),
+            )
+            for week in range(periods)
+        ]
+    )
+
+    def entries():
+        for week, run in enumerate(runs):
+            for employee in staff:
+                if not employee.is_active and week >= periods // 2:
+                    continue
+                daily = employee.worker_type == "daily"
+                yield WorkEntry(
+                    employee=employee,
+                    payroll_run=run,
+                    payroll_period_start=run.payroll_period_start,
+                    payroll_period_end=run.payroll_period_end,
+                    hours_worked=None if daily else Decimal(rng.randrange(80, 200)) / 4,
+                    days_worked=Decimal(rng.randrange(1, 7)) if daily else None,
+                )
+
+    batch = []
+    for entry in entries():
+        batch.append(entry)
+        if len(batch) == batch_size:
+            WorkEntry.objects.bulk_create(batch)
+            batch = []
+    WorkEntry.objects.bulk_create(batch)
+
+    rebuild_totals()
+    return runs
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, *args):
+    """
+    Runs ``func(*args)`` once inside a savepoint that is rolled back, and
+    returns ``(seconds, query_count)``.
+    """
+    sid = transaction.savepoint()
+    counter = _QueryCounter()
+    try:
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+    finally:
+        transaction.savepoint_rollback(sid)
+    return elapsed, counter.count
+
+
+def _fetch(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+
+
+def _get(client, url):
+    """A GET that builds its response: the response cache is off."""
+    with override_settings(PAYROLL_RESPONSE_CACHE_TTL=0):
+        _fetch(client, url)
+
+
+def _cached_get(client, url):
+    """
+    A GET answered from the response cache; ``run_benchmarks`` calls its
+    ``warm`` before each timing, as other cases may have evicted the entry.
+    """
+
+    def get():
+        _fetch(client, url)
+
+    get.warm = get
+    return get
+
+
+def _ingest_body(employees, period_start):
+    period_end = period_start + timedelta(days=6)
+    for employee in employees:
+        amount = "days_worked" if employee.worker_type == "daily" else "hours_worked"
+        yield json.dumps(
+            {
+                "employee_id": employee.id,
+                "payroll_period_start": period_start.isoformat(),
+                "payroll_period_end": period_end.isoformat(),
+                amount: "5" if amount == "days_worked" else "40",
+            }
+        ).encode() + b"\n"
+
+
+def benchmark_cases(runs):
+    """Returns ``[(name, callable), ...]`` for the hot paths over ``runs``."""
+    client = Client()
+    latest = runs[-1]
+    next_start = latest.payroll_period_start + timedelta(weeks=1)
+    active = list(Employee.objects.filter(is_active=True).only("id", "worker_type"))
+
+    return [
+        (
+            "calculate_payroll",
+            lambda: calculate_payroll(
+                latest.payroll_period_start, latest.payroll_period_end, latest
+            ),
+        ),
+        (
+            "calculate_payroll_per_employee",
+            lambda: calculate_payroll_per_employee(
+                latest.payroll_period_start, latest.payroll_period_end, latest
+            ),
+        ),
+        ("close_payroll_run", lambda: close_payroll_run(latest.pk)),
+        (
+            "bulk_ingest_ndjson",
+            lambda: ingest_work_entries(
+                iter_ndjson_rows(_ingest_body(active, next_start))
+            ),
+        ),
+        ("GET employees", lambda: _get(client, "/api/employees/")),
+        ("GET workentries page", lambda: _get(client, "/api/workentries/")),
+        ("GET payroll-runs", lambda: _get(client, "/api/payroll-runs/")),
+        (
+            "GET payroll-run entries page",
+            lambda: _get(client, f"/api/payroll-runs/{latest.pk}/entries/"),
+        ),
+        # Cache hits are reported on their own, not mixed into the GETs above.
+        ("GET employees (cached)", _cached_get(client, "/api/employees/")),
+        ("GET workentries page (cached)", _cached_get(client, "/api/workentries/")),
+    ]
+
+
+def run_benchmarks(sizes, periods=4, seed=0, repeat=3, cases=None, log=None):
+    """
+    For each employee count in ``sizes``: generates data inside a transaction
+    that is rolled back afterwards, then times the benchmark cases -- all but
+    OPT_IN_CASES, or just ``cases`` -- (best of ``repeat``) and counts their
+    queries. Returns a JSON-serialisable dict.
+    """
+    results = []
+    for size in sizes:
+        with transaction.atomic():
+            runs = generate_payroll_data(size, periods, seed=seed, inactive_ratio=0.05)
+            for name, func in benchmark_cases(runs):
+                if (name not in cases) if cases else (name in OPT_IN_CASES):
+                    continue
+                timings = []
+                for _ in range(repeat):
+                    if hasattr(func, "warm"):
+                        func.warm()
+                    timings.append(measure(func))
+                seconds = min(t for t, _ in timings)
+                queries = timings[0][1]
+                results.append(
+                    {"size": size, "case": name, "seconds": seconds, "queries": queries}
+                )
+                if log:
+                    log(f"{size:>8} {name:<32} {seconds:9.4f}s {queries:>6} queries")
+            transaction.set_rollback(True)
+
+    return {
+        "database": connection.vendor,
+        "periods": periods,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare_to_baseline(current, baseline, time_tolerance=0.25):
+    """
+    Returns a list of regression messages: any case that issues more queries
+    than the baseline, or is slower by more than ``time_tolerance``.
+    """
+    previous = {(r["size"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["size"], result["case"]))
+        if before is None:
+            continue
+        label = f"{result['case']} @ {result['size']}"
+        if result["queries"] > before["queries"]:
+            regressions.append(
+                f"{label}: {result['queries']} queries (baseline {before['queries']})"
+            )
+        if result["seconds"] > before["seconds"] * (1 + time_tolerance):
+            regressions.append(
+                f"{label}: {result['seconds']:.4f}s (baseline {before['seconds']:.4f}s)"
+            )
+    return regressions
@@ -0,0 +1,148 @@
+# clearops/backend/payroll/conditional.py
+"""
+Conditional GET and response caching for the read-heavy payroll endpoints.
+
+A response's version is a short list of values read with one cheap query
+per table -- ``updated_at`` of the object(s) involved and, for collections,
+the table's write count and last write time. Tables too big to count on
+every request (work entries, employees, deduction rules) have their writes
+counted by database triggers into TableVersion rows (migration 0015), read
+by ``write_version``; the small ones use ``table_version``, their row count
+(so deletions count too) and ``max(updated_at)`` (indexed). From the
+version come a weak ETag and a Last-Modified date. A request whose
+If-None-Match / If-Modified-Since matches gets 304 without the response
+being built or serialized.
+
+Otherwise the serialized data is looked up in the cache under the request
+path and ETag, so a write, which changes the ETag, also retires every
+cached response built before it. Closed payroll runs never change, so their
+responses may be cached by clients for a day; everything else must be
+revalidated.
+
+Settings:
+    PAYROLL_RESPONSE_CACHE_TTL  -- seconds serialized responses are cached; 0 disables
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import TableVersion
+
+IMMUTABLE_MAX_AGE = 24 * 60 * 60
+
+
+def table_version(queryset):
+    """``(row count, latest updated_at)`` of a queryset, in one aggregate query."""
+    row = queryset.order_by().aggregate(count=Count("pk"), last=Max("updated_at"))
+    return row["count"], row["last"]
+
+
+def write_version(model):
+    """
+    ``(write count, last write)`` of a trigger-counted table, read from its
+    few counter rows; ``table_version`` of the whole table on databases
+    without the counters.
+    """
+    row = TableVersion.objects.filter(table=model._meta.db_table).aggregate(
+        slots=Count("pk"), writes=Sum("version"), last=Max("updated_at")
+    )
+    if not row["slots"]:
+        return table_version(model.objects.all())
+    return row["writes"], row["last"]
+
+
+def bump_write_version(model):
+    """For changes the triggers do not see, such as detaching a partition."""
+    TableVersion.objects.filter(table=model._meta.db_table, slot=0).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+
+
+def _last_modified(versions):
+    stamps = []
+    for value in versions:
+        if isinstance(value, tuple):
+            stamps.extend(v for v in value if isinstance(v, datetime))
+        elif isinstance(value, datetime):
+            stamps.append(value)
+    return max(stamps) if stamps else None
+
+
+def _set_validators(response, etag, last_modified, immutable):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    if immutable:
+        patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, versions, render, immutable=False):
+    """
+    Returns 304 when the client's validators match ``versions``, else the
+    cached or freshly rendered response. ``render`` is called without
+    arguments and must return a DRF Response.
+    """
+    digest = hashlib.sha1(repr(versions).encode()).hexdigest()
+    etag = f'W/"{digest}"'
+    last_modified = _last_modified(versions)
+
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if not_modified is not None:
+        return _set_validators(not_modified, etag, last_modified, immutable)
+
+    ttl = getattr(settings, "PAYROLL_RESPONSE_CACHE_TTL", 300)
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    cache_key = f"payroll-response:{path}:{digest}"
+    data = cache.get(cache_key) if ttl else None
+    if data is not None:
+        response = Response(data)
+    else:
+        response = render()
+        if ttl and response.status_code == 200:
+            cache.set(cache_key, response.data, ttl)
+    return _set_validators(response, etag, last_modified, immutable)
+
+
+class ConditionalGetMixin:
+    """
+    Adds conditional GET and response caching to ``list`` and ``retrieve``.
+    Views implement ``get_list_versions()`` and ``get_object_versions(pk)``;
+    the latter returns None when the object does not exist.
+    """
+
+    def is_immutable(self, versions):
+        return False
+
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        return conditional_response(
+            request, self.get_list_versions(), lambda: render(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        render = super().retrieve
+        versions = self.get_object_versions(
+            self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        )
+        if versions is None:
+            return render(request, *args, **kwargs)
+        return conditional_response(
+            request,
+            versions,
+            lambda: render(request, *args, **kwargs),
+            immutable=self.is_immutable(versions),
+        )
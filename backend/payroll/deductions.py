@@ -0,0 +1,169 @@
+# clearops/backend/payroll/deductions.py
+"""
+Deduction and withholding rules, compiled into an evaluation plan.
+
+DeductionRule rows are parsed once into a DeductionPlan: per worker type, a
+tuple of plain functions over Decimals with every rate, amount, band and cap
+already converted. Applying the plan to an entry is then arithmetic only --
+no queries and no parsing -- so the payroll services apply it to all entries
+of a run in one pass before their batched UPDATEs.
+
+Each rule takes an amount from its base (gross pay, or what is left after
+the rules before it), rounded half up to the cent, limited by its cap and
+never more than is left, so net pay is never negative.
+
+    percentage  -- ``rate`` percent of the base
+    flat        -- ``amount`` per entry
+    bracket     -- marginal ``rate`` percent of the part of the base in each
+                   band; bands are ``{"up_to": amount or null, "rate": pct}``
+                   in increasing order, the last one open-ended
+
+``deduction_plan()`` returns the compiled plan of the active rules. It is
+kept in process and keyed by the rule table's write version (see
+payroll.conditional, one small query), so any rule change -- in this
+process or another -- is picked up by the next payroll computation.
+"""
+import threading
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from .conditional import write_version
+from .models import DeductionRule, Employee
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+HUNDRED = Decimal("100")
+WORKER_TYPES = [code for code, _ in Employee.WORKER_TYPE_CHOICES]
+
+
+def to_cents(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _decimal(value, name):
+    try:
+        value = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"{name} must be a number.")
+    if not value.is_finite() or value < 0:
+        raise ValueError(f"{name} must not be negative.")
+    return value
+
+
+def _percentage(rule):
+    if rule.rate is None:
+        raise ValueError("A percentage rule needs a rate.")
+    fraction = _decimal(rule.rate, "rate") / HUNDRED
+    return lambda base: base * fraction
+
+
+def _flat(rule):
+    if rule.amount is None:
+        raise ValueError("A flat rule needs an amount.")
+    amount = _decimal(rule.amount, "amount")
+    return lambda base: amount
+
+
+def _bracket(rule):
+    if not isinstance(rule.brackets, list) or not rule.brackets:
+        raise ValueError("A bracket rule needs a list of brackets.")
+    bands, lower = [], ZERO
+    for i, band in enumerate(rule.brackets):
+        if not isinstance(band, dict) or "rate" not in band:
+            raise ValueError("Each bracket needs a rate.")
+        upper = band.get("up_to")
+        if upper is None:
+            if i != len(rule.brackets) - 1:
+                raise ValueError("Only the last bracket may be open-ended.")
+        else:
+            upper = _decimal(upper, "up_to")
+            if upper <= lower:
+                raise ValueError("Brackets must be in increasing order of up_to.")
+        bands.append((lower, upper, _decimal(band["rate"], "rate") / HUNDRED))
+        lower = upper
+    bands = tuple(bands)
+
+    def bracketed(base):
+        taken = ZERO
+        for lower, upper, fraction in bands:
+            if base <= lower:
+                break
+            top = base if upper is None or base < upper else upper
+            taken += (top - lower) * fraction
+        return taken
+
+    return bracketed
+
+
+COMPILERS = {"percentage": _percentage, "flat": _flat, "bracket": _bracket}
+
+
+def compile_rule(rule):
+    """
+    ``(from_net, amount_fn, cap)`` for a DeductionRule (saved or not);
+    raises ValueError if the rule is incomplete or malformed.
+    """
+    if rule.kind not in COMPILERS:
+        raise ValueError(f"Unknown rule kind {rule.kind!r}.")
+    cap = _decimal(rule.cap, "cap") if rule.cap is not None else None
+    return rule.base == "net", COMPILERS[rule.kind](rule), cap
+
+
+class DeductionPlan:
+    """Compiled rules, grouped by the worker type they apply to."""
+
+    def __init__(self, rules=()):
+        compiled = [(rule.worker_type, compile_rule(rule)) for rule in rules]
+        self.steps = {
+            worker_type: tuple(
+                step for applies_to, step in compiled if applies_to in (None, worker_type)
+            )
+            for worker_type in WORKER_TYPES
+        }
+        self.default_steps = tuple(step for applies_to, step in compiled if applies_to is None)
+        self.empty = not compiled
+
+    def apply(self, gross, worker_type):
+        """``(gross, total_deductions, net_pay)``, all rounded to the cent."""
+        gross = to_cents(gross or ZERO)
+        if self.empty:
+            return gross, ZERO, gross
+        net = gross
+        for from_net, amount_fn, cap in self.steps.get(worker_type, self.default_steps):
+            amount = to_cents(amount_fn(net if from_net else gross))
+            if cap is not None and amount > cap:
+                amount = cap
+            net -= min(amount, net)
+        return gross, gross - net, net
+
+
+class _PlanCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._plan = DeductionPlan()
+
+    def get(self):
+        version = write_version(DeductionRule)
+        with self._lock:
+            if version == self._version:
+                return self._plan
+        # A table never written to has no rules; that needs no second query.
+        if version[0] == 0:
+            plan = DeductionPlan()
+        else:
+            plan = DeductionPlan(DeductionRule.objects.filter(is_active=True))
+        with self._lock:
+            self._version, self._plan = version, plan
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+
+
+plan_cache = _PlanCache()
+
+
+def deduction_plan():
+    """The compiled plan of the active rules; one query when unchanged."""
+    return plan_cache.get()
@@ -0,0 +1,264 @@
+# clearops/backend/payroll/exports.py
+"""
+Streaming exports of a payroll run's work entries.
+
+Rows are read with ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL) as plain tuples and encoded as they are read, so memory use does
+not depend on the size of the run and the first bytes go out as soon as the
+first chunk arrives. Each format is a generator of bytes for a
+``StreamingHttpResponse``:
+
+    csv   -- one row per work entry
+    xlsx  -- the same rows as a single-sheet workbook, zipped on the fly
+    bank  -- bank-transfer entries grouped into one payout line per employee,
+             with a header and a trailer carrying the count and total
+
+Text cells of the CSV formats that a spreadsheet would read as a formula
+(starting with = + - @, tab or carriage return) are prefixed with ``'``.
+XLSX cells need no escaping: inline strings are never evaluated.
+"""
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Count, Sum
+from rest_framework.renderers import BaseRenderer
+
+from .models import WorkEntry
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    ("entry_id", "id"),
+    ("employee_id", "employee_id"),
+    ("first_name", "employee__first_name"),
+    ("last_name", "employee__last_name"),
+    ("worker_type", "employee__worker_type"),
+    ("period_start", "payroll_period_start"),
+    ("period_end", "payroll_period_end"),
+    ("hours_worked", "hours_worked"),
+    ("days_worked", "days_worked"),
+    ("gross_pay", "gross_pay"),
+    ("total_deductions", "total_deductions"),
+    ("net_pay", "net_pay"),
+    ("is_paid", "is_paid"),
+    ("payment_type", "payment_type"),
+    ("payment_date", "payment_date"),
+]
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Declares an export format to DRF content negotiation, so ``?format=csv``
+    etc. resolve. The export view returns a StreamingHttpResponse, which is
+    never passed through a renderer; its errors are rendered as JSON.
+    """
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class XLSXExportRenderer(ExportRenderer):
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    format = "xlsx"
+
+
+class BankExportRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "bank"
+
+
+def export_rows(payroll_run):
+    """Work entries of the run as tuples in EXPORT_COLUMNS order."""
+    return (
+        WorkEntry.objects.filter(payroll_run=payroll_run)
+        .order_by("id")
+        .values_list(*(field for _, field in EXPORT_COLUMNS))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable buffer whose contents are drained by the generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(rows):
+    sink = io.StringIO()
+    writer = csv.writer(sink)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        yield sink.getvalue().encode()
+        sink.seek(0)
+        sink.truncate()
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def _batched(chunks, size=64 * 1024):
+    """Joins small byte strings into writes of roughly ``size`` bytes."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream_csv(payroll_run):
+    header = [[name for name, _ in EXPORT_COLUMNS]]
+    return _batched(_csv_lines(_chain(header, export_rows(payroll_run))))
+
+
+def bank_payouts(payroll_run):
+    """One row per employee with their summed bank-transfer net pay."""
+    return (
+        WorkEntry.objects.filter(payroll_run=payroll_run, payment_type="bank_transfer")
+        .values_list("employee_id", "employee__first_name", "employee__last_name")
+        .annotate(entries=Count("id"), amount=Sum("net_pay"))
+        .order_by("employee_id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def stream_bank_file(payroll_run):
+    """
+    A payout file: ``H`` header with the run and its period, one ``P`` line
+    per payee, and a ``T`` trailer with the payee count and total amount.
+    """
+
+    def records():
+        yield [
+            "H",
+            f"RUN{payroll_run.pk}",
+            payroll_run.payroll_period_start.isoformat(),
+            payroll_run.payroll_period_end.isoformat(),
+        ]
+        count, total = 0, Decimal("0.00")
+        for employee_id, first_name, last_name, entries, amount in bank_payouts(
+            payroll_run
+        ):
+            count += 1
+            total += amount
+            yield ["P", employee_id, f"{first_name} {last_name}", entries, f"{amount:.2f}"]
+        yield ["T", count, f"{total:.2f}"]
+
+    return _batched(_csv_lines(records()))
+
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Payroll" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, bool):
+        value = "yes" if value else "no"
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def stream_xlsx(payroll_run):
+    """
+    The CSV export's rows as an .xlsx workbook. Cells use inline strings so
+    no shared-string table has to be built up in memory, and the zip is
+    written to an unseekable sink (entry sizes go in data descriptors).
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        yield sink.drain()
+
+        rows = _chain([[name for name, _ in EXPORT_COLUMNS]], export_rows(payroll_run))
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            for lines in _batched(
+                f"<row>{''.join(_xlsx_cell(value) for value in row)}</row>".encode()
+                for row in rows
+            ):
+                sheet.write(lines)
+                data = sink.drain()
+                if data:
+                    yield data
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "xlsx": (stream_xlsx, XLSXExportRenderer.media_type, "xlsx"),
+    "bank": (stream_bank_file, "text/csv", "bank.csv"),
+}
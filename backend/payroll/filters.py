@@ -0,0 +1,70 @@
+# clearops/backend/payroll/filters.py
+"""
+Query-string filters for list endpoints.
+
+Views declare ``filter_fields`` as ``{query parameter: ORM lookup}``, e.g.
+``{"period_start": "payroll_period_start__gte"}``. Each value is parsed by
+the model field the lookup starts from, so a malformed value is a 400 rather
+than a database error, and every filter becomes a plain column comparison
+the indexes on that model can serve. Booleans accept true/false, 1/0 and
+yes/no; a comma-separated value on an ``__in`` lookup is split.
+
+Name search uses DRF's SearchFilter with ``^`` (prefix) fields, which
+compile to ``UPPER(col) LIKE 'TERM%'`` on PostgreSQL and ``col LIKE
+'term%'`` on SQLite; migration 0010 adds the matching expression index
+(``text_pattern_ops``) and NOCASE index respectively.
+"""
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+TRUE_VALUES = {"true", "1", "yes", "t"}
+FALSE_VALUES = {"false", "0", "no", "f"}
+
+
+def parse_value(field, raw):
+    if isinstance(field, models.BooleanField):
+        value = raw.strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValidationError("Must be true or false.")
+    value = field.to_python(raw.strip())
+    if field.choices and value not in dict(field.flatchoices):
+        raise ValidationError(f"'{value}' is not a valid choice.")
+    return value
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """Applies the view's ``filter_fields`` from the query string."""
+
+    def get_filters(self, request, model, filter_fields):
+        filters, errors = {}, {}
+        for param, lookup in filter_fields.items():
+            raw = request.query_params.get(param)
+            if raw is None or raw == "":
+                continue
+            try:
+                field = model._meta.get_field(lookup.split("__")[0])
+            except FieldDoesNotExist:
+                raise LookupError(f"{model.__name__} has no field for filter {lookup!r}.")
+            try:
+                if lookup.endswith("__in"):
+                    value = [parse_value(field, part) for part in raw.split(",") if part.strip()]
+                else:
+                    value = parse_value(field, raw)
+            except ValidationError as exc:
+                errors[param] = exc.messages
+                continue
+            filters[lookup] = value
+        if errors:
+            raise serializers.ValidationError(errors)
+        return filters
+
+    def filter_queryset(self, request, queryset, view):
+        filter_fields = getattr(view, "filter_fields", None)
+        if not filter_fields:
+            return queryset
+        return queryset.filter(**self.get_filters(request, queryset.model, filter_fields))
@@ -0,0 +1,56 @@
+# clearops/backend/payroll/health.py
+"""
+Health check endpoints for process managers and load balancers.
+
+    /healthz  -- liveness: the worker is up and answering; touches nothing
+    /readyz   -- readiness: every configured database answers ``SELECT 1``
+                 and the default cache round-trips a value; 503 otherwise
+
+Neither is routed through DRF, so probes stay cheap and need no auth.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+
+HEALTH_PATHS = ("/healthz", "/readyz")
+
+
+def _check_database(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def _check_cache():
+    cache.set("payroll-health:ping", 1, 10)
+    if cache.get("payroll-health:ping") != 1:
+        raise RuntimeError("cache did not return the value just stored")
+
+
+def health_view(request):
+    return JsonResponse({"status": "ok"})
+
+
+def ready_view(request):
+    checks = {f"database:{alias}": lambda alias=alias: _check_database(alias) for alias in connections}
+    checks["cache"] = _check_cache
+
+    results, healthy = {}, True
+    for name, check in checks.items():
+        started = time.perf_counter()
+        try:
+            check()
+        except Exception as exc:
+            healthy = False
+            results[name] = {"status": "error", "error": str(exc)}
+        else:
+            results[name] = {
+                "status": "ok",
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+    return JsonResponse(
+        {"status": "ok" if healthy else "error", "checks": results},
+        status=200 if healthy else 503,
+    )
@@ -0,0 +1,157 @@
+# clearops/backend/payroll/idempotency.py
+"""
+``Idempotency-Key`` support for write endpoints.
+
+The first request with a given key is processed normally and its response
+(status and data, for anything but server errors) is cached for
+PAYROLL_IDEMPOTENCY_TTL seconds. A retry with the same key replays that
+response from the cache without touching the database, marked with an
+``Idempotent-Replayed: true`` header. While the first request is still
+running, a retry gets 409; reusing a key for a different request gets 422.
+
+Requests are compared by path, query, content type and a hash of the body.
+Bodies in the view's ``streaming_formats`` are never buffered: the view
+reads them through ``request_stream``, which hashes them as they are read,
+and a retry is hashed by reading its body through once, without the view.
+
+The in-progress marker only lives PAYROLL_IDEMPOTENCY_PENDING_TTL seconds,
+so a key whose request died with its worker is free again shortly after
+the worker's own timeout rather than answering 409 for the full TTL.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class _DigestingStream:
+    """Iterates the lines of a body stream, hashing them as they go by."""
+
+    def __init__(self, stream):
+        self.stream = stream or ()
+        self.digest = hashlib.sha256()
+
+    def __iter__(self):
+        for line in self.stream:
+            self.digest.update(line)
+            yield line
+
+    def hexdigest(self):
+        # Whatever the view left unread is part of the body too.
+        for line in self.stream:
+            self.digest.update(line)
+        return self.digest.hexdigest()
+
+
+def request_stream(request):
+    """
+    The raw body stream of ``request``, for views that read streamed bodies;
+    under Idempotency-Key handling, one that hashes the body as it is read.
+    """
+    return getattr(request, "_idempotency_stream", None) or request.stream
+
+
+def _media_type(request):
+    return (request.content_type or "").split(";")[0].strip().lower()
+
+
+def _fingerprint(request):
+    return hashlib.sha256(
+        "\n".join(
+            [
+                request.method,
+                request.path,
+                request.META.get("QUERY_STRING", ""),
+                _media_type(request),
+            ]
+        ).encode()
+    ).hexdigest()
+
+
+def _cache_key(request, key):
+    digest = hashlib.sha256(f"{request.path}\n{key}".encode()).hexdigest()
+    return f"payroll-idempotency:{digest}"
+
+
+def _error(message, status_code):
+    return Response({"error": message}, status=status_code)
+
+
+def idempotent(view_method):
+    """Decorates an APIView handler (e.g. ``post``) with Idempotency-Key handling."""
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(
+                f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters.",
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        ttl = getattr(settings, "PAYROLL_IDEMPOTENCY_TTL", 900)
+        pending_ttl = min(getattr(settings, "PAYROLL_IDEMPOTENCY_PENDING_TTL", 120), ttl)
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        streamed = _media_type(request) in getattr(self, "streaming_formats", {})
+        # A streamed body's hash is only known once it has been read.
+        body = None if streamed else hashlib.sha256(request.body).hexdigest()
+        pending = {"fingerprint": fingerprint, "body": body, "pending": True}
+        different = _error(
+            f"{IDEMPOTENCY_HEADER} was already used for a different request.",
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+        if not cache.add(cache_key, pending, pending_ttl):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                if stored["fingerprint"] != fingerprint or (
+                    not streamed and stored["body"] != body
+                ):
+                    return different
+                if stored.get("pending"):
+                    return _error(
+                        f"A request with this {IDEMPOTENCY_HEADER} is in progress.",
+                        status.HTTP_409_CONFLICT,
+                    )
+                if streamed and _DigestingStream(request.stream).hexdigest() != stored["body"]:
+                    return different
+                response = Response(stored["data"], status=stored["status"])
+                response["Idempotent-Replayed"] = "true"
+                return response
+            # Expired between add() and get(); claim the key again.
+            cache.set(cache_key, pending, pending_ttl)
+
+        if streamed:
+            request._idempotency_stream = _DigestingStream(request.stream)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            if streamed:
+                body = request._idempotency_stream.hexdigest()
+            cache.set(
+                cache_key,
+                {
+                    "fingerprint": fingerprint,
+                    "body": body,
+                    "status": response.status_code,
+                    "data": response.data,
+                },
+                ttl,
+            )
+        return response
+
+    return wrapper
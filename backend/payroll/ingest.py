@@ -0,0 +1,241 @@
+# clearops/backend/payroll/ingest.py
+"""
+Streaming bulk ingest of work entries from NDJSON or CSV request bodies.
+
+Rows are parsed lazily and processed in fixed-size batches: each batch
+resolves its employees (and payroll runs) with one query each and is written
+with a single ``bulk_create`` that upserts on the employee/period unique key,
+followed by a refresh of the payroll totals the batch touched.
+Memory use is bounded by the batch size, not the upload size.
+"""
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Employee, PayrollRun, WorkEntry
+from .totals import refresh_totals_for
+
+INGEST_BATCH_SIZE = 2000
+
+# Stop collecting row errors past this many; the counts stay exact.
+MAX_REPORTED_ERRORS = 1000
+
+UNIQUE_FIELDS = ["employee", "payroll_period_start", "payroll_period_end"]
+UPSERT_FIELDS = ["payroll_run", "hours_worked", "days_worked", "notes", "updated_at"]
+
+
+class InvalidRow:
+    """Placeholder yielded for a row that could not be read at all."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+class IngestReport:
+    def __init__(self):
+        self.rows = 0
+        self.written = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "written": self.written,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _decoded_lines(stream):
+    for line in stream:
+        yield line.decode("utf-8") if isinstance(line, bytes) else line
+
+
+def iter_ndjson_rows(stream):
+    """Yields ``(row_number, row_or_error)`` for each non-blank NDJSON line."""
+    for number, line in enumerate(_decoded_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, InvalidRow("Invalid JSON.")
+            continue
+        if not isinstance(row, dict):
+            yield number, InvalidRow("Each line must be a JSON object.")
+            continue
+        yield number, row
+
+
+def iter_csv_rows(stream):
+    """Yields ``(row_number, row)`` for each CSV record after the header."""
+    reader = csv.DictReader(_decoded_lines(stream))
+    for number, row in enumerate(reader, start=1):
+        yield number, row
+
+
+def _parse_date(value):
+    return date.fromisoformat(str(value).strip())
+
+
+def _parse_amount(value):
+    if value is None or str(value).strip() == "":
+        return None
+    amount = Decimal(str(value).strip())
+    # More than two decimal places is rejected, as by WorkEntrySerializer,
+    # rather than rounded, so the range check sees the value that is stored.
+    if not amount.is_finite() or amount.as_tuple().exponent < -2:
+        raise InvalidOperation
+    if amount < 0 or amount >= 1000:
+        raise InvalidOperation
+    return amount.quantize(Decimal("0.01"))
+
+
+def _parse_int(value):
+    if value is None or str(value).strip() == "":
+        return None
+    return int(str(value).strip())
+
+
+def _parse_row(row):
+    """Parses one raw row into field values; returns ``(values, errors)``."""
+    if isinstance(row, InvalidRow):
+        return None, {"non_field_errors": [row.message]}
+
+    values, errors = {}, {}
+
+    for field, parse in (
+        ("employee_id", _parse_int),
+        ("payroll_period_start", _parse_date),
+        ("payroll_period_end", _parse_date),
+        ("hours_worked", _parse_amount),
+        ("days_worked", _parse_amount),
+        ("payroll_run", _parse_int),
+    ):
+        raw = row.get(field)
+        if field in ("employee_id", "payroll_period_start", "payroll_period_end") and (
+            raw is None or str(raw).strip() == ""
+        ):
+            errors[field] = ["This field is required."]
+            continue
+        try:
+            values[field] = parse(raw)
+        except (ValueError, TypeError, InvalidOperation):
+            errors[field] = [f"Invalid value: {raw!r}."]
+    values["notes"] = row.get("notes") or None
+
+    if not errors and values["payroll_period_end"] < values["payroll_period_start"]:
+        errors["non_field_errors"] = ["Payroll period end must be after start."]
+    return values, errors
+
+
+def _check_amounts(worker_type, values):
+    if worker_type == "hourly" and not values["hours_worked"]:
+        return ["Hours worked must be provided for hourly employees."]
+    if worker_type == "daily" and not values["days_worked"]:
+        return ["Days worked must be provided for daily employees."]
+    return None
+
+
+def _ingest_batch(batch, report):
+    parsed = []
+    for number, row in batch:
+        values, errors = _parse_row(row)
+        if errors:
+            report.add_error(number, errors)
+        else:
+            parsed.append((number, values))
+    if not parsed:
+        return
+
+    employees = Employee.objects.filter(is_active=True).only("id", "worker_type").in_bulk(
+        {values["employee_id"] for _, values in parsed}
+    )
+    run_ids = {values["payroll_run"] for _, values in parsed} - {None}
+    runs = (
+        PayrollRun.objects.only("id", "is_closed").in_bulk(run_ids) if run_ids else {}
+    )
+    existing = {
+        (employee_id, start, end): (run_id, is_paid)
+        for employee_id, start, end, run_id, is_paid in WorkEntry.objects.filter(
+            employee_id__in=employees.keys(),
+            payroll_period_start__in={v["payroll_period_start"] for _, v in parsed},
+        ).values_list(
+            "employee_id",
+            "payroll_period_start",
+            "payroll_period_end",
+            "payroll_run_id",
+            "is_paid",
+        ).order_by()
+    }
+
+    # Later rows for the same employee/period replace earlier ones.
+    entries = {}
+    for number, values in parsed:
+        employee = employees.get(values["employee_id"])
+        key = (
+            values["employee_id"],
+            values["payroll_period_start"],
+            values["payroll_period_end"],
+        )
+        run = runs.get(values["payroll_run"])
+        if employee is None:
+            report.add_error(number, {"employee_id": ["Unknown or inactive employee."]})
+        elif values["payroll_run"] is not None and run is None:
+            report.add_error(number, {"payroll_run": ["Unknown payroll run."]})
+        elif run is not None and run.is_closed:
+            report.add_error(number, {"payroll_run": ["Payroll run is already closed."]})
+        elif existing.get(key, (None, False))[1]:
+            report.add_error(number, {"non_field_errors": ["Work entry is already paid."]})
+        elif amount_errors := _check_amounts(employee.worker_type, values):
+            report.add_error(number, {"non_field_errors": amount_errors})
+        else:
+            entries[key] = WorkEntry(
+                employee_id=values["employee_id"],
+                payroll_run_id=values["payroll_run"],
+                payroll_period_start=values["payroll_period_start"],
+                payroll_period_end=values["payroll_period_end"],
+                hours_worked=values["hours_worked"],
+                days_worked=values["days_worked"],
+                notes=values["notes"],
+            )
+
+    if entries:
+        # Totals for runs that upserted entries are moving away from, too.
+        moved = [
+            (key[0], existing[key][0], key[1]) for key in entries if key in existing
+        ]
+        with transaction.atomic():
+            WorkEntry.objects.bulk_create(
+                entries.values(),
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPSERT_FIELDS,
+            )
+            refresh_totals_for(moved + list(entries.values()))
+        report.written += len(entries)
+
+
+def ingest_work_entries(rows, batch_size=INGEST_BATCH_SIZE):
+    """
+    Validates and upserts ``(row_number, row)`` pairs batch by batch and
+    returns an IngestReport. Each batch commits on its own, so a bad row
+    only affects itself.
+    """
+    report = IngestReport()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        report.rows += len(batch)
+        _ingest_batch(batch, report)
+    return report
@@ -0,0 +1,339 @@
+# clearops/backend/payroll/jobs.py
+"""
+Background execution of long-running payroll work.
+
+Jobs are recorded in the database (PayrollCloseJob) and executed on an
+in-process thread pool, so no external broker is needed. Set
+``PAYROLL_JOBS_EAGER = True`` to run jobs inline, e.g. in tests.
+
+Closing a run is mostly per-entry Python (pay, deductions, audit diffs), so
+threads share one core under the GIL. With PAYROLL_JOB_PROCESSES set, jobs
+run on a pool of that many worker processes instead, each with its own
+database connection, and the close_payroll_runs command always closes runs
+in worker processes. Job progress then travels through the shared cache, so
+a process-local cache is refused.
+
+A batch close records a PayrollCloseBatch; ``batch_status`` reads it back as
+one report of every run's job status, progress and timing.
+
+A job dies with its process -- a recycled or timed-out worker -- without
+recording an outcome. Running jobs publish a heartbeat with their progress,
+and a queued or running job silent for PAYROLL_JOB_TIMEOUT seconds is marked
+failed when next looked at (status polls, a new close request), so the run
+can be closed again.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import PayrollCloseBatch, PayrollCloseJob, PayrollRun, WorkEntry
+from .processes import process_pool
+from .services import PayrollError, close_payroll_run
+
+logger = logging.getLogger(__name__)
+
+BATCH_STATUSES = ["queued", "running", "succeeded", "failed", "skipped"]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            processes = getattr(settings, "PAYROLL_JOB_PROCESSES", 0)
+            if processes:
+                backend = settings.CACHES["default"]["BACKEND"]
+                if "locmem" in backend.lower() or "dummy" in backend.lower():
+                    raise ImproperlyConfigured(
+                        "PAYROLL_JOB_PROCESSES needs a shared cache for job "
+                        "progress; set DJANGO_CACHE_URL (see config/settings.py)."
+                    )
+                _executor = process_pool(processes)
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "PAYROLL_JOB_WORKERS", 2),
+                    thread_name_prefix="payroll-jobs",
+                )
+    return _executor
+
+
+
+
+def _run_in_worker(func, *args):
+    try:
+        func(*args)
+    finally:
+        # Workers get their own connections; don't leak them.
+        connections.close_all()
+
+
+def _submit(func, *args):
+    if getattr(settings, "PAYROLL_JOBS_EAGER", False):
+        func(*args)
+    else:
+        _get_executor().submit(_run_in_worker, func, *args)
+
+
+def _progress_key(job_id):
+    return f"payroll-close-job:{job_id}:progress"
+
+
+def _publish_progress(job_id, processed, total):
+    cache.set(_progress_key(job_id), (processed, total, timezone.now()), timeout=3600)
+
+
+def expire_if_stale(job):
+    """
+    Marks a queued or running job failed once neither its start nor its
+    progress has been seen for PAYROLL_JOB_TIMEOUT seconds. Returns the job.
+    """
+    if job.status not in ("queued", "running"):
+        return job
+    last_seen = job.started_at or job.created_at
+    live = cache.get(_progress_key(job.pk))
+    if live is not None:
+        last_seen = max(last_seen, live[2])
+    timeout = timedelta(seconds=getattr(settings, "PAYROLL_JOB_TIMEOUT", 600))
+    if timezone.now() - last_seen < timeout:
+        return job
+
+    # Conditional, so a worker finishing right now is not overwritten.
+    PayrollCloseJob.objects.filter(pk=job.pk, status=job.status).update(
+        status="failed",
+        error="Close job stopped responding; its worker was probably restarted.",
+        finished_at=timezone.now(),
+    )
+    logger.warning("Payroll close job %s expired after %s", job.pk, timeout)
+    job.refresh_from_db()
+    return job
+
+
+def enqueue_close(payroll_run):
+    """
+    Returns the pending close job for a payroll run, creating and scheduling
+    one if none is queued or running (stale jobs are expired first). The job
+    starts once the current transaction commits.
+    """
+    job = PayrollCloseJob.objects.filter(
+        payroll_run=payroll_run, status__in=["queued", "running"]
+    ).first()
+    if job is not None and expire_if_stale(job).status in ("queued", "running"):
+        return job
+
+    job = PayrollCloseJob.objects.create(
+        payroll_run=payroll_run,
+        entries_total=payroll_run.work_entries.count(),
+    )
+    transaction.on_commit(lambda: _submit(run_close_job, job.pk))
+    return job
+
+
+def enqueue_closes(run_ids):
+    """
+    Queues a close job (see enqueue_close) for each of ``run_ids`` that exists,
+    is open and has work entries, records the batch, and returns a report
+    listing every run in order with its status (queued or skipped), job id
+    or reason, plus counts and the batch id for ``batch_status``.
+    """
+    runs = PayrollRun.objects.in_bulk(run_ids)
+    with_entries = set(
+        WorkEntry.objects.filter(payroll_run_id__in=list(runs))
+        .values_list("payroll_run_id", flat=True)
+        .distinct()
+    )
+    report = {"runs": [], "queued": 0, "skipped": 0}
+    for run_id in run_ids:
+        result = {"payroll_run": run_id, "status": "skipped", "job_id": None, "error": None}
+        payroll_run = runs.get(run_id)
+        if payroll_run is None:
+            result["error"] = "Payroll run does not exist."
+        elif payroll_run.is_closed:
+            result["error"] = "Payroll run is already closed."
+        elif run_id not in with_entries:
+            result["error"] = "No work entries to process."
+        else:
+            result.update(status="queued", job_id=enqueue_close(payroll_run).pk)
+        report[result["status"]] += 1
+        report["runs"].append(result)
+    report["batch_id"] = PayrollCloseBatch.objects.create(runs=report["runs"]).pk
+    return report
+
+
+def batch_status(batch):
+    """
+    Consolidated report of a PayrollCloseBatch: every run in order with its
+    job's status, progress, error and seconds running (skipped runs keep
+    their reason), counts per status, whether all jobs have finished, and
+    the seconds from the request to the last job's end (or until now).
+    """
+    job_ids = [queued["job_id"] for queued in batch.runs if queued["job_id"]]
+    jobs = {
+        job.pk: load_progress(job) for job in PayrollCloseJob.objects.filter(pk__in=job_ids)
+    }
+    now = timezone.now()
+    report = {"batch_id": batch.pk, "runs": [], **dict.fromkeys(BATCH_STATUSES, 0)}
+    last_finished = batch.created_at
+    for queued in batch.runs:
+        result = dict(queued, entries_processed=0, entries_total=0, seconds=None)
+        job = jobs.get(queued["job_id"])
+        if job is not None:
+            result.update(
+                status=job.status,
+                error=job.error,
+                entries_processed=job.entries_processed,
+                entries_total=job.entries_total,
+            )
+            if job.started_at is not None:
+                ended = job.finished_at or now
+                result["seconds"] = round((ended - job.started_at).total_seconds(), 4)
+            if job.finished_at is not None:
+                last_finished = max(last_finished, job.finished_at)
+        elif queued["job_id"]:
+            result.update(status="skipped", error="Close job no longer exists.")
+        report[result["status"]] += 1
+        report["runs"].append(result)
+    report["done"] = not (report["queued"] or report["running"])
+    ended = last_finished if report["done"] else now
+    report["seconds"] = round((ended - batch.created_at).total_seconds(), 4)
+    return report
+
+
+def run_close_job(job_id):
+    """
+    Executes a queued close job. Progress is published to the cache while the
+    close transaction is open (its row updates are not visible until commit)
+    and the final state is stored on the job row.
+    """
+    # Claimed only while still queued: an expired job is not run after all.
+    claimed = PayrollCloseJob.objects.filter(pk=job_id, status="queued").update(
+        status="running", started_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = PayrollCloseJob.objects.get(pk=job_id)
+
+    def progress(processed, total):
+        _publish_progress(job_id, processed, total)
+
+    try:
+        close_payroll_run(job.payroll_run_id, progress=progress)
+    except PayrollError as exc:
+        job.status = "failed"
+        job.error = str(exc)
+    except Exception:
+        logger.exception("Payroll close job %s failed", job_id)
+        job.status = "failed"
+        job.error = "Unexpected error while closing payroll run."
+    else:
+        job.status = "succeeded"
+        job.entries_processed = job.entries_total
+    finally:
+        job.finished_at = timezone.now()
+        job.save(
+            update_fields=["status", "error", "entries_processed", "finished_at"]
+        )
+        cache.delete(_progress_key(job_id))
+
+
+def load_progress(job):
+    """
+    Refreshes ``entries_processed``/``entries_total`` on a running job from
+    the progress published by its worker, expiring the job if it is stale.
+    """
+    job = expire_if_stale(job)
+    if job.status == "running":
+        live = cache.get(_progress_key(job.pk))
+        if live is not None:
+            job.entries_processed, job.entries_total, _ = live
+    return job
+
+
+def runs_to_close(run_ids=None, period_start=None, period_end=None):
+    """
+    Ids of the runs a batch close should process: the given ``run_ids``
+    (closed or missing ones are reported as skipped), or every open run
+    whose period lies within ``period_start``..``period_end``.
+    """
+    if run_ids is not None:
+        return list(dict.fromkeys(run_ids))
+    return list(
+        PayrollRun.objects.filter(
+            is_closed=False,
+            payroll_period_start__gte=period_start,
+            payroll_period_end__lte=period_end,
+        )
+        .order_by("payroll_period_start")
+        .values_list("id", flat=True)
+    )
+
+
+def _close_one(run_id):
+    entries = 0
+
+    def progress(processed, total):
+        nonlocal entries
+        entries = processed
+
+    start = time.perf_counter()
+    result = {"payroll_run": run_id, "status": "closed", "error": None}
+    try:
+        close_payroll_run(run_id, progress=progress)
+    except PayrollRun.DoesNotExist:
+        result.update(status="skipped", error="Payroll run does not exist.")
+    except PayrollError as exc:
+        result.update(status="skipped", error=str(exc))
+    except Exception:
+        logger.exception("Batch close of payroll run %s failed", run_id)
+        result.update(status="failed", error="Unexpected error while closing payroll run.")
+    result["entries"] = entries
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _close_one_in_worker(run_id):
+    try:
+        return _close_one(run_id)
+    finally:
+        connections.close_all()
+
+
+def close_runs(run_ids, workers=None):
+    """
+    Closes several payroll runs in parallel, waiting for all of them, and
+    returns a consolidated report; for the close_payroll_runs command (the
+    API queues one close job per run instead, see enqueue_closes).
+
+    Each run is closed by close_payroll_run in its own transaction, in a
+    worker process with its own database connection, so a failing run rolls
+    back alone and the per-entry Python of different runs uses different
+    cores. The report lists every run in ``run_ids`` order with its status
+    (closed, skipped or failed), entry count and timing, plus overall counts.
+    """
+    workers = min(
+        workers or getattr(settings, "PAYROLL_BATCH_CLOSE_WORKERS", 4), len(run_ids) or 1
+    )
+    if connections["default"].vendor == "sqlite":
+        # SQLite allows a single writer; concurrent closes would only time out.
+        workers = 1
+    start = time.perf_counter()
+    if getattr(settings, "PAYROLL_JOBS_EAGER", False) or workers == 1:
+        results = [_close_one(run_id) for run_id in run_ids]
+    else:
+        with process_pool(workers) as pool:
+            results = list(pool.map(_close_one_in_worker, run_ids))
+
+    report = {"runs": results, "closed": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        report[result["status"]] += 1
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    return report
@@ -0,0 +1,116 @@
+# clearops/backend/payroll/loadtest.py
+"""
+A small closed-loop HTTP load generator for comparing serving setups.
+
+``concurrency`` client threads each hold one keep-alive connection and issue
+GET requests round-robin over ``paths`` until ``duration`` seconds have
+passed, so the result is the throughput the server sustains with that many
+clients in flight. Latencies are recorded per path; non-2xx/304 responses
+and connection errors count as errors (the client reconnects and carries
+on). Standard library only, so it runs wherever the backend does.
+"""
+import http.client
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = [
+    "/api/employees/?is_active=true",
+    "/api/workentries/?page_size=100",
+    "/api/payroll-runs/",
+    "/api/analytics/?group_by=month",
+]
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _connection(url, timeout):
+    parts = urlsplit(url)
+    cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+def _client(base_url, paths, offset, deadline, timeout, latencies, errors, lock):
+    prefix = urlsplit(base_url).path.rstrip("/")
+    conn = _connection(base_url, timeout)
+    local_latencies, local_errors = defaultdict(list), defaultdict(int)
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", prefix + path, headers={"Accept": "application/json"})
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            local_errors[path] += 1
+            conn.close()
+            conn = _connection(base_url, timeout)
+            continue
+        local_latencies[path].append(time.perf_counter() - started)
+        if not (200 <= response.status < 300 or response.status == 304):
+            local_errors[path] += 1
+    conn.close()
+    with lock:
+        for path, values in local_latencies.items():
+            latencies[path].extend(values)
+        for path, count in local_errors.items():
+            errors[path] += count
+
+
+def _summary(values, errors, seconds):
+    values = sorted(values)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / seconds, 1),
+        "p50_ms": round(_percentile(values, 0.5) * 1000, 2) if values else None,
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 2) if values else None,
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 2) if values else None,
+    }
+
+
+def load_test(base_url, paths=None, concurrency=16, duration=10.0, timeout=10.0):
+    """
+    Runs the load test and returns a JSON-serialisable dict with overall and
+    per-path request counts, errors, requests per second and latency
+    percentiles.
+    """
+    paths = list(paths or DEFAULT_PATHS)
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(base_url, paths, n, deadline, timeout, latencies, errors, lock),
+            daemon=True,
+        )
+        for n in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    return {
+        "url": base_url,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 2),
+        "total": _summary(
+            [v for values in latencies.values() for v in values], sum(errors.values()), seconds
+        ),
+        "paths": {
+            path: _summary(latencies.get(path, []), errors.get(path, 0), seconds)
+            for path in paths
+        },
+    }
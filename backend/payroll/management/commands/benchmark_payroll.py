@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from payroll.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the set-based calculate_payroll against the per-employee loop. "
+        "Data is generated inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Total WorkEntry rows to generate for each run.",
+        )
+        parser.add_argument(
+            "--periods",
+            type=int,
+            default=10,
+            help="Number of weekly payroll periods the rows are spread over.",
+        )
+        parser.add_argument(
+            "--skip-loop-above",
+            type=int,
+            default=None,
+            help="Skip the per-employee loop for sizes larger than this.",
+        )
+
+    def handle(self, *args, **options):
+        periods = options["periods"]
+        for size in options["sizes"]:
+            cases = ["calculate_payroll"]
+            if options["skip_loop_above"] is None or size <= options["skip_loop_above"]:
+                cases.append("calculate_payroll_per_employee")
+            results = run_benchmarks(
+                [max(size // periods, 1)], periods=periods, repeat=1, cases=cases
+            )["results"]
+            timings = {r["case"]: (r["seconds"], r["queries"]) for r in results}
+
+            set_time, set_queries = timings["calculate_payroll"]
+            self.stdout.write(
+                f"{size:>9} rows  set-based: {set_time:8.3f}s {set_queries:>7} queries"
+            )
+            if "calculate_payroll_per_employee" in timings:
+                loop_time, loop_queries = timings["calculate_payroll_per_employee"]
+                self.stdout.write(
+                    f"{'':>9}       loop:      {loop_time:8.3f}s {loop_queries:>7} queries"
+                    f"  ({loop_time / set_time:.1f}x)"
+                )
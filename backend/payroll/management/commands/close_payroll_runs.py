@@ -0,0 +1,48 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.jobs import close_runs, runs_to_close
+
+
+class Command(BaseCommand):
+    help = (
+        "Close several payroll runs in parallel, each in its own transaction. "
+        "Select runs by id or every open run within a period range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", nargs="+", type=int, help="Payroll run ids.")
+        parser.add_argument("--start", type=date.fromisoformat, help="Period range start (YYYY-MM-DD).")
+        parser.add_argument("--end", type=date.fromisoformat, help="Period range end (YYYY-MM-DD).")
+        parser.add_argument("--workers", type=int, help="Runs closed concurrently.")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options["runs"]:
+            run_ids = runs_to_close(options["runs"])
+        elif options["start"] and options["end"]:
+            run_ids = runs_to_close(period_start=options["start"], period_end=options["end"])
+        else:
+            raise CommandError("Pass --runs, or both --start and --end.")
+
+        report = close_runs(run_ids, workers=options["workers"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for result in report["runs"]:
+                line = (
+                    f"run {result['payroll_run']:>6}  {result['status']:<8}"
+                    f"{result['entries']:>8} entries {result['seconds']:9.3f}s"
+                )
+                if result["error"]:
+                    line += f"  {result['error']}"
+                self.stdout.write(line)
+            self.stdout.write(
+                f"{report['closed']} closed, {report['skipped']} skipped, "
+                f"{report['failed']} failed in {report['seconds']:.3f}s"
+            )
+        if report["failed"]:
+            raise CommandError(f"{report['failed']} payroll runs failed to close.")
@@ -0,0 +1,147 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from payroll.models import PayrollCloseJob, PayrollRun, WorkEntry
+from payroll.pagination import KeysetPagination
+from payroll.rates import effective_rates
+from payroll.services import active_employee_period_totals
+from payroll.views import WORK_ENTRY_LIST_DEFERRED, PayrollRunViewSet
+
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    # "SCAN t USING INDEX i" walks an index in order; a bare "SCAN t" does not.
+    "sqlite": re.compile(r"\bSCAN (\w+)\b(?! USING)"),
+}
+
+
+def hot_queries(run_id, period_start, period_end):
+    """
+    The hot queries from services.py and views.py, with sample parameters.
+    Each entry is ``(name, queryset, tables_allowed_to_scan)``.
+    """
+    page_order = KeysetPagination.ordering
+    return [
+        (
+            "calculate_payroll: active employee totals",
+            active_employee_period_totals(period_start, period_end),
+            # Every active employee is read by design.
+            {"payroll_employee"},
+        ),
+        (
+            "calculate_payroll: period entries",
+            WorkEntry.objects.filter(
+                payroll_period_start=period_start, payroll_period_end=period_end
+            ),
+            set(),
+        ),
+        (
+            "close_payroll_run: run entries with employees",
+            WorkEntry.objects.filter(payroll_run_id=run_id).select_related("employee"),
+            set(),
+        ),
+        (
+            "rates in effect on period start",
+            effective_rates(
+                WorkEntry.objects.filter(payroll_run_id=run_id).values("employee_id"),
+                period_start,
+            ),
+            set(),
+        ),
+        (
+            "unpaid entries in period",
+            WorkEntry.objects.filter(
+                is_paid=False,
+                payroll_period_start=period_start,
+                payroll_period_end=period_end,
+            ),
+            set(),
+        ),
+        (
+            "paid entries by payment type",
+            WorkEntry.objects.filter(is_paid=True, payment_type="bank_transfer"),
+            set(),
+        ),
+        (
+            "WorkEntryViewSet.list page",
+            WorkEntry.objects.select_related("employee")
+            .defer(*WORK_ENTRY_LIST_DEFERRED)
+            .order_by(*page_order)[:101],
+            set(),
+        ),
+        (
+            "PayrollRunViewSet.entries page",
+            WorkEntry.objects.filter(payroll_run_id=run_id)
+            .select_related("employee")
+            .defer(*WORK_ENTRY_LIST_DEFERRED)
+            .order_by(*page_order)[:101],
+            set(),
+        ),
+        (
+            "PayrollRunViewSet.list",
+            PayrollRunViewSet.queryset.all(),
+            # The run list returns every run by design.
+            {"payroll_payrollrun"},
+        ),
+        (
+            "PayrollRunViewSet.close_status latest job",
+            PayrollCloseJob.objects.filter(payroll_run_id=run_id)[:1],
+            set(),
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the hot payroll queries and flag sequential scans. "
+        "Exits with an error when an unexpected scan is found."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--allow-seqscan",
+            action="store_true",
+            help=(
+                "PostgreSQL only: let the planner choose seq scans. By default "
+                "they are disabled so a scan means no usable index exists, "
+                "whatever the table size."
+            ),
+        )
+        parser.add_argument(
+            "--verbose-plans", action="store_true", help="Print every plan."
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"EXPLAIN checks are not supported on {connection.vendor}.")
+
+        run = PayrollRun.objects.order_by("-payroll_period_start").first()
+        if run is not None:
+            params = (run.id, run.payroll_period_start, run.payroll_period_end)
+        else:
+            params = (0, date.today(), date.today())
+
+        flagged = []
+        with transaction.atomic():
+            if connection.vendor == "postgresql" and not options["allow_seqscan"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset, allowed in hot_queries(*params):
+                plan = queryset.explain()
+                scanned = set(pattern.findall(plan)) - allowed
+                if scanned:
+                    flagged.append(name)
+                    self.stdout.write(
+                        self.style.ERROR(f"SEQ SCAN  {name}: {', '.join(sorted(scanned))}")
+                    )
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok        {name}"))
+                if scanned or options["verbose_plans"]:
+                    self.stdout.write(f"    {plan}".replace("\n", "\n    "))
+
+        if flagged:
+            raise CommandError(f"{len(flagged)} hot queries use sequential scans.")
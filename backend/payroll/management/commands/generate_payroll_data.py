@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from payroll.benchmarks import generate_payroll_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate reproducible synthetic employees, weekly payroll runs and "
+        "work entries for load and benchmark testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=1000)
+        parser.add_argument("--periods", type=int, default=12, help="Weekly periods.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--daily-ratio",
+            type=float,
+            default=0.3,
+            help="Fraction of employees paid by the day.",
+        )
+        parser.add_argument(
+            "--inactive-ratio",
+            type=float,
+            default=0.0,
+            help="Fraction of employees created as deactivated staff.",
+        )
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=None,
+            help=(
+                "First period start (YYYY-MM-DD). Defaults to the day after the "
+                "latest existing run, or 2024-01-01 on an empty database."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            runs = generate_payroll_data(
+                options["employees"],
+                options["periods"],
+                seed=options["seed"],
+                daily_ratio=options["daily_ratio"],
+                inactive_ratio=options["inactive_ratio"],
+                first_period_start=options["start"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {options['employees']} employees and {len(runs)} payroll runs "
+                f"({runs[0].payroll_period_start} to {runs[-1].payroll_period_end})."
+                if runs
+                else f"Created {options['employees']} employees."
+            )
+        )
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.loadtest import DEFAULT_PATHS, load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running backend over HTTP: N concurrent keep-alive clients "
+        "request the payroll read endpoints for a fixed time. Run it against "
+        "`manage.py runserver` and against `gunicorn` to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help=f"Path to request (repeatable). Default: {', '.join(DEFAULT_PATHS)}",
+        )
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds.")
+        parser.add_argument("--timeout", type=float, default=10.0)
+        parser.add_argument("--output", help="Write JSON results to this file.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["duration"] <= 0:
+            raise CommandError("--concurrency and --duration must be positive.")
+
+        results = load_test(
+            options["url"],
+            options["paths"],
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            timeout=options["timeout"],
+        )
+
+        self.stdout.write(
+            f"{'path':<44} {'requests':>8} {'errors':>6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for path, stats in [*results["paths"].items(), ("TOTAL", results["total"])]:
+            self.stdout.write(
+                f"{path:<44} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8} "
+                + " ".join(f"{stats[key] if stats[key] is not None else '-':>8}"
+                           for key in ("p50_ms", "p95_ms", "p99_ms"))
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if results["total"]["requests"] == 0:
+            raise CommandError("No request succeeded; is the server running?")
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.partitions import (
+    archivable_months,
+    archive_name,
+    archive_partition,
+    detach_partition,
+    ensure_partitions,
+    is_partitioned,
+    partition_name,
+    partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the monthly work entry partitions (PostgreSQL): create the "
+        "coming months' partitions and, with --archive or --detach, move past "
+        "months whose payroll runs are all closed to the archive tier. Run it "
+        "daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead", type=int, default=3, help="Months of partitions to keep ready."
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Freeze closed months' partitions; they stay queryable.",
+        )
+        parser.add_argument(
+            "--tablespace", help="With --archive, move archived partitions to this tablespace."
+        )
+        parser.add_argument(
+            "--detach",
+            action="store_true",
+            help="Detach closed months' partitions into standalone archive tables.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only list what would be archived."
+        )
+
+    def handle(self, *args, **options):
+        if options["ahead"] < 0:
+            raise CommandError("--ahead must not be negative.")
+        if options["archive"] and options["detach"]:
+            raise CommandError("Use either --archive or --detach.")
+        if options["tablespace"] and not options["archive"]:
+            raise CommandError("--tablespace requires --archive.")
+
+        closed = archivable_months()
+        if not is_partitioned():
+            self.stdout.write(
+                "Work entries are not partitioned on this database; nothing to do. "
+                f"{len(closed)} month(s) would be archivable."
+            )
+            return
+        if options["dry_run"]:
+            archived = partitions()
+            for month in closed:
+                if not archived.get(month, False):
+                    self.stdout.write(f"Would archive {partition_name(month)}")
+            return
+
+        for month in ensure_partitions(ahead=options["ahead"]):
+            self.stdout.write(f"Created {partition_name(month)}")
+
+        archived = partitions() if options["archive"] or options["detach"] else {}
+        for month in closed:
+            if month not in archived:
+                continue
+            if options["detach"]:
+                detach_partition(month)
+                self.stdout.write(f"Detached {partition_name(month)} as {archive_name(month)}")
+            elif not archived[month]:
+                archive_partition(month, tablespace=options["tablespace"])
+                self.stdout.write(f"Archived {partition_name(month)}")
+        self.stdout.write(self.style.SUCCESS("Work entry partitions are up to date."))
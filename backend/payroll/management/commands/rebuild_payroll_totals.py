@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from payroll.totals import check_totals, rebuild_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized payroll totals from work entries, "
+        "or with --check verify them without writing. Totals of months "
+        "detached by partition_work_entries are kept as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare stored totals with a fresh aggregation.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            with transaction.atomic():
+                rebuild_totals()
+            self.stdout.write(self.style.SUCCESS("Payroll totals rebuilt."))
+
+        mismatches = check_totals()
+        if mismatches["runs"] or mismatches["employee_months"]:
+            for run_id in mismatches["runs"]:
+                self.stderr.write(f"Payroll run {run_id}: totals out of date")
+            for employee_id, month in mismatches["employee_months"]:
+                self.stderr.write(
+                    f"Employee {employee_id} {month:%Y-%m}: totals out of date"
+                )
+            raise CommandError(
+                f"{len(mismatches['runs'])} run and "
+                f"{len(mismatches['employee_months'])} employee-month totals differ."
+            )
+        self.stdout.write(self.style.SUCCESS("Payroll totals are consistent."))
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.benchmarks import compare_to_baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot payroll paths and count their queries at several dataset "
+        "sizes. Data is generated in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10_000],
+            help="Employee counts to benchmark.",
+        )
+        parser.add_argument("--periods", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs.")
+        parser.add_argument(
+            "--case", action="append", dest="cases", help="Only run these cases."
+        )
+        parser.add_argument("--output", help="Write JSON results to this file.")
+        parser.add_argument(
+            "--baseline", help="Fail if results regress against this JSON file."
+        )
+        parser.add_argument(
+            "--time-tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown against the baseline (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(
+            options["sizes"],
+            periods=options["periods"],
+            seed=options["seed"],
+            repeat=options["repeat"],
+            cases=options["cases"],
+            log=self.stdout.write,
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)
+            regressions = compare_to_baseline(
+                results, baseline, time_tolerance=options["time_tolerance"]
+            )
+            if regressions:
+                for message in regressions:
+                    self.stderr.write(message)
+                raise CommandError(f"{len(regressions)} benchmark regressions.")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
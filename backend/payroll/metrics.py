@@ -0,0 +1,266 @@
+# clearops/backend/payroll/metrics.py
+"""
+Per-view request metrics for the payroll API.
+
+MetricsMiddleware records, for a sampled fraction of requests, the SQL query
+count, DB time, serialization (response rendering) time, total time and
+response size of each view. It adds them to the response as a
+``Server-Timing`` header and aggregates them in an in-process registry
+(summaries with p50/p95/p99 over a sliding window of recent samples).
+
+Each worker process publishes its summaries and rate cache counters to the
+shared cache every PUBLISH_INTERVAL seconds, and ``/metrics`` renders those
+of every worker seen within PUBLISH_TTL in the Prometheus text format, one
+series per worker (label ``worker="host:pid"``), whichever worker answers
+the scrape. Quantiles cannot be merged, so summing across workers is left
+to the query (``sum without (worker)`` for counts and sums).
+
+Settings:
+    PAYROLL_METRICS_ENABLED        -- middleware is removed entirely when False
+    PAYROLL_METRICS_SAMPLE_RATE    -- fraction of requests measured (0.0-1.0)
+    PAYROLL_METRICS_SERVER_TIMING  -- emit the Server-Timing header
+"""
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from .health import HEALTH_PATHS
+from .rates import rate_cache
+
+METRICS_PATH = "/metrics"
+# Probes and the scrape itself would only skew the per-view numbers.
+UNMEASURED_PATHS = {METRICS_PATH, *HEALTH_PATHS}
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW_SIZE = 1024
+PUBLISH_INTERVAL = 15
+PUBLISH_TTL = 300
+WORKERS_KEY = "payroll-metrics:workers"
+
+METRICS = {
+    "request_duration_seconds": "Total time spent handling the request.",
+    "db_queries": "SQL queries executed per request.",
+    "db_duration_seconds": "Time spent executing SQL per request.",
+    "serialization_duration_seconds": "Time spent rendering the response body.",
+    "response_bytes": "Size of the response body.",
+}
+
+
+class Summary:
+    """Count and sum since start, quantiles over the last WINDOW_SIZE samples."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW_SIZE)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {}
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._published = 0.0
+
+    def observe(self, view, values):
+        with self._lock:
+            for name, value in values.items():
+                summary = self._summaries.get((name, view))
+                if summary is None:
+                    summary = self._summaries[(name, view)] = Summary()
+                summary.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._summaries.clear()
+            self._published = 0.0
+
+    def snapshot(self):
+        """``[(name, view, quantiles, sum, count)]``, small enough to publish."""
+        with self._lock:
+            return [
+                (name, view, summary.quantiles(), summary.sum, summary.count)
+                for (name, view), summary in sorted(self._summaries.items())
+            ]
+
+    def publish(self, force=False):
+        """
+        Stores this worker's snapshot in the shared cache, at most every
+        PUBLISH_INTERVAL seconds unless ``force``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._published < PUBLISH_INTERVAL:
+                return
+            self._published = now
+        worker = worker_name()
+        cache.set(
+            f"payroll-metrics:{worker}",
+            {"summaries": self.snapshot(), "rate_cache": rate_cache.stats()},
+            PUBLISH_TTL,
+        )
+        # Read-modify-write: a worker lost to a concurrent update is added
+        # back on its next publish.
+        seen, wall_clock = cache.get(WORKERS_KEY) or {}, time.time()
+        seen = {name: at for name, at in seen.items() if wall_clock - at < PUBLISH_TTL}
+        seen[worker] = wall_clock
+        cache.set(WORKERS_KEY, seen, None)
+
+
+registry = Registry()
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def published_workers():
+    """``{worker: published payload}`` of the workers seen within PUBLISH_TTL."""
+    workers = sorted(cache.get(WORKERS_KEY) or {})
+    payloads = cache.get_many([f"payroll-metrics:{worker}" for worker in workers])
+    return {
+        worker: payloads[f"payroll-metrics:{worker}"]
+        for worker in workers
+        if f"payroll-metrics:{worker}" in payloads
+    }
+
+
+def render_summaries(workers):
+    lines = []
+    for name, help_text in METRICS.items():
+        metric = f"payroll_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for worker, payload in workers.items():
+            for summary_name, view, quantiles, total, count in payload["summaries"]:
+                if summary_name != name:
+                    continue
+                label = f'view="{view}",worker="{worker}"'
+                for q, value in quantiles.items():
+                    lines.append(f'{metric}{{{label},quantile="{q}"}} {value:.6g}')
+                lines.append(f"{metric}_sum{{{label}}} {total:.6g}")
+                lines.append(f"{metric}_count{{{label}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class _RequestStats:
+    """Execute wrapper counting queries and DB time for one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PAYROLL_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PAYROLL_METRICS_SAMPLE_RATE", 1.0)
+        self.server_timing = getattr(settings, "PAYROLL_METRICS_SERVER_TIMING", True)
+
+    def __call__(self, request):
+        if request.path.rstrip("/") in UNMEASURED_PATHS or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats = request._payroll_metrics = _RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            start = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unresolved"
+        values = {
+            "request_duration_seconds": total,
+            "db_queries": stats.queries,
+            "db_duration_seconds": stats.db_time,
+            "serialization_duration_seconds": stats.render_time,
+        }
+        size = _response_size(response)
+        if size is not None:
+            values["response_bytes"] = size
+        registry.observe(view, values)
+        registry.publish()
+
+        if self.server_timing:
+            response["Server-Timing"] = (
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f"serialize;dur={stats.render_time * 1000:.1f}, "
+                f"total;dur={total * 1000:.1f}"
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step.
+        stats = getattr(request, "_payroll_metrics", None)
+        if stats is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                stats.render_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def render_rate_cache(workers):
+    return "".join(
+        f"# HELP payroll_rate_cache_{name} {help_text}\n"
+        f"# TYPE payroll_rate_cache_{name} {kind}\n"
+        + "".join(
+            f'payroll_rate_cache_{name}{{worker="{worker}"}} {payload["rate_cache"][key]}\n'
+            for worker, payload in workers.items()
+        )
+        for name, key, kind, help_text in (
+            ("hits_total", "hits", "counter", "Pay rate lookups served from cache."),
+            ("misses_total", "misses", "counter", "Pay rate lookups loaded from the database."),
+            ("entries", "size", "gauge", "Employees held in the in-process rate cache."),
+        )
+    )
+
+
+def metrics_view(request):
+    registry.publish(force=True)
+    workers = published_workers()
+    return HttpResponse(
+        render_summaries(workers) + render_rate_cache(workers),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
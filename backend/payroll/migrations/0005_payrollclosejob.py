@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0004_alter_workentry_payment_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollCloseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('entries_total', models.PositiveIntegerField(default=0)),
+                ('entries_processed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='close_jobs', to='payroll.payrollrun')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
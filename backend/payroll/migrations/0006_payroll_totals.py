@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_payrollclosejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRunTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('paid_count', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_days', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('total_net', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payroll_run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='totals', to='payroll.payrollrun')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmployeePeriodTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('paid_count', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_days', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('total_net', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_totals', to='payroll.employee')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'unique_together': {('employee', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0006_payroll_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payrollclosejob',
+            index=models.Index(fields=['payroll_run', '-created_at'], name='closejob_run_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollrun',
+            index=models.Index(fields=['-date_processed'], name='payrollrun_processed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workentry',
+            index=models.Index(fields=['-payroll_period_start', '-id'], name='workentry_period_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workentry',
+            index=models.Index(fields=['payroll_run', '-payroll_period_start', '-id'], name='workentry_run_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workentry',
+            index=models.Index(fields=['payroll_period_start', 'payroll_period_end'], name='workentry_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workentry',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['payroll_period_start', 'payroll_period_end'], name='workentry_unpaid_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workentry',
+            index=models.Index(fields=['payment_type', 'is_paid'], name='workentry_payment_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_rate_history(apps, schema_editor):
+    # Each employee's current rate becomes their opening rate.
+    Employee = apps.get_model("payroll", "Employee")
+    EmployeeRate = apps.get_model("payroll", "EmployeeRate")
+    EmployeeRate.objects.bulk_create(
+        (
+            EmployeeRate(
+                employee_id=employee.id,
+                worker_type=employee.worker_type,
+                hourly_rate=employee.hourly_rate,
+                daily_rate=employee.daily_rate,
+                effective_from=employee.hire_date,
+            )
+            for employee in Employee.objects.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0007_payroll_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker_type', models.CharField(choices=[('hourly', 'Hourly'), ('daily', 'Daily')], max_length=10)),
+                ('hourly_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('daily_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('effective_from', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_history', to='payroll.employee')),
+            ],
+            options={
+                'ordering': ['employee', '-effective_from'],
+                'constraints': [models.UniqueConstraint(fields=('employee', 'effective_from'), name='employeerate_effective_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_rate_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+NAME_COLUMNS = ("first_name", "last_name")
+
+# Indexes matching what a ``^name`` SearchFilter (``istartswith``) compiles
+# to on each backend; other backends fall back to a table scan.
+PREFIX_INDEX_SQL = {
+    "postgresql": (
+        'CREATE INDEX IF NOT EXISTS "employee_{column}_prefix_idx" '
+        'ON "payroll_employee" (UPPER("{column}"::text) text_pattern_ops)'
+    ),
+    "sqlite": (
+        'CREATE INDEX IF NOT EXISTS "employee_{column}_prefix_idx" '
+        'ON "payroll_employee" ("{column}" COLLATE NOCASE)'
+    ),
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    sql = PREFIX_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql is None:
+        return
+    for column in NAME_COLUMNS:
+        schema_editor.execute(sql.format(column=column))
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in PREFIX_INDEX_SQL:
+        return
+    for column in NAME_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "employee_{column}_prefix_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['is_active', 'worker_type'], name='employee_active_type_idx'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0010_employee_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeductionRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('percentage', 'Percentage'), ('flat', 'Flat amount'), ('bracket', 'Bracketed table')], max_length=12)),
+                ('worker_type', models.CharField(blank=True, choices=[('hourly', 'Hourly'), ('daily', 'Daily')], max_length=10, null=True)),
+                ('base', models.CharField(choices=[('gross', 'Gross pay'), ('net', 'Pay left after earlier rules')], default='gross', max_length=5)),
+                ('rate', models.DecimalField(blank=True, decimal_places=3, max_digits=6, null=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('brackets', models.JSONField(blank=True, default=list)),
+                ('cap', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+            },
+        ),
+    ]
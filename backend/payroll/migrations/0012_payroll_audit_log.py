@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0011_deduction_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollAuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('entry_paid', 'Work entry pay computed'), ('run_calculated', 'Payroll calculated'), ('run_closed', 'Payroll run closed')], max_length=20)),
+                ('changes', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('employee', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payroll.employee')),
+                ('payroll_run', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payroll.payrollrun')),
+                ('work_entry', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payroll.workentry')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['payroll_run', '-id'], name='audit_run_id_idx'), models.Index(fields=['employee', '-id'], name='audit_employee_id_idx')],
+            },
+        ),
+    ]
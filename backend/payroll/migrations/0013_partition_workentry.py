@@ -0,0 +1,98 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:14
+
+from datetime import date
+
+from django.db import migrations
+
+TABLE = "payroll_workentry"
+# Monthly partitions are named like payroll.partitions.partition_name().
+PARTITION = TABLE + "_p{:%Y_%m}"
+DEFAULT_PARTITION = TABLE + "_default"
+MONTHS_AHEAD = 3
+
+
+def _month_after(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _rebuild(schema_editor, partitioned):
+    """
+    Recreates the work entry table, plain or partitioned by month of
+    ``payroll_period_start``, keeping its rows, ids, indexes and foreign
+    keys. Partitioned, the primary key must include the partition key, so
+    it becomes ``(id, payroll_period_start)``; ids stay unique through the
+    identity sequence.
+    """
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [TABLE, TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('u', 'f') ORDER BY contype DESC",
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            f"SELECT date_trunc('month', min(payroll_period_start))::date, "
+            f"date_trunc('month', max(payroll_period_start))::date FROM {TABLE}"
+        )
+        first, last = cursor.fetchone()
+
+    execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old")
+    execute(
+        f"CREATE TABLE {TABLE} (LIKE {TABLE}_old INCLUDING DEFAULTS INCLUDING IDENTITY)"
+        + (" PARTITION BY RANGE (payroll_period_start)" if partitioned else "")
+    )
+    if partitioned:
+        this_month = date.today().replace(day=1)
+        month, end = min(first or this_month, this_month), this_month
+        for _ in range(MONTHS_AHEAD):
+            end = _month_after(end)
+        if last is not None and last > end:
+            end = last
+        while month <= end:
+            execute(
+                f"CREATE TABLE {PARTITION.format(month)} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month}') TO ('{_month_after(month)}')"
+            )
+            month = _month_after(month)
+        execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+    execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_old")
+    execute(f"DROP TABLE {TABLE}_old")
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+    )
+    primary_key = "id, payroll_period_start" if partitioned else "id"
+    execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({primary_key})")
+    for name, definition in constraints:
+        execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+    for definition in indexes:
+        execute(definition)
+
+
+def partition_work_entries(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_work_entries(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0012_payroll_audit_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_work_entries, unpartition_work_entries),
+    ]
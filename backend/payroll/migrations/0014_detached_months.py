@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:20
+
+from datetime import date
+
+from django.db import migrations, models
+
+# Named like payroll.partitions.archive_name().
+ARCHIVE_PREFIX = "payroll_workentry_archive_"
+
+
+def record_detached_months(apps, schema_editor):
+    """Records the months detached before this table existed."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    DetachedMonth = apps.get_model("payroll", "DetachedMonth")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() "
+            "AND tablename LIKE %s",
+            [ARCHIVE_PREFIX + "%"],
+        )
+        tables = [row[0] for row in cursor.fetchall()]
+    DetachedMonth.objects.bulk_create(
+        DetachedMonth(month=date(int(table[-7:-3]), int(table[-2:]), 1), table=table)
+        for table in tables
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0013_partition_workentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetachedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('table', models.CharField(max_length=63)),
+                ('detached_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RunPython(record_detached_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:24
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Tables whose writes are counted (read by payroll.conditional.write_version),
+# and the counter rows per table on PostgreSQL: each connection bumps the slot
+# of its backend pid, so concurrent writers rarely wait on each other's row
+# lock. SQLite has a single writer and uses slot 0.
+TABLES = ["payroll_workentry", "payroll_employee", "payroll_deductionrule"]
+SLOTS = 16
+
+PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION payroll_bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE payroll_tableversion
+    SET version = version + 1, updated_at = clock_timestamp()
+    WHERE "table" = TG_TABLE_NAME AND slot = pg_backend_pid() % {slots};
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+PG_TRIGGER = (
+    "CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE "
+    "ON {table} FOR EACH STATEMENT EXECUTE FUNCTION payroll_bump_table_version()"
+)
+SQLITE_TRIGGER = """
+CREATE TRIGGER {table}_version_{operation} AFTER {operation} ON {table}
+BEGIN
+    UPDATE payroll_tableversion
+    SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+    WHERE "table" = '{table}' AND slot = 0;
+END
+"""
+SQLITE_OPERATIONS = ["insert", "update", "delete"]
+
+
+def create_version_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ("postgresql", "sqlite"):
+        # No counters: payroll.conditional falls back to counting rows.
+        return
+    slots = SLOTS if vendor == "postgresql" else 1
+    TableVersion = apps.get_model("payroll", "TableVersion")
+    now = timezone.now()
+    # Counting from the rows already there keeps "never written" (0) meaning
+    # "empty".
+    rows = {}
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            rows[table] = cursor.fetchone()[0]
+    TableVersion.objects.bulk_create(
+        TableVersion(
+            table=table, slot=slot, version=rows[table] if slot == 0 else 0, updated_at=now
+        )
+        for table in TABLES
+        for slot in range(slots)
+    )
+    if vendor == "postgresql":
+        schema_editor.execute(PG_FUNCTION.format(slots=slots), None)
+        for table in TABLES:
+            schema_editor.execute(PG_TRIGGER.format(table=table), None)
+    else:
+        for table in TABLES:
+            for operation in SQLITE_OPERATIONS:
+                schema_editor.execute(
+                    SQLITE_TRIGGER.format(table=table, operation=operation), None
+                )
+
+
+def drop_version_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for table in TABLES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_version ON {table}", None)
+        schema_editor.execute("DROP FUNCTION IF EXISTS payroll_bump_table_version()", None)
+    elif vendor == "sqlite":
+        for table in TABLES:
+            for operation in SQLITE_OPERATIONS:
+                schema_editor.execute(
+                    f"DROP TRIGGER IF EXISTS {table}_version_{operation}", None
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0014_detached_months'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=63)),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('table', 'slot')},
+            },
+        ),
+        migrations.RunPython(create_version_triggers, drop_version_triggers),
+    ]
@@ -21,11 +21,51 @@ class Employee(models.Model):
     )
     is_active = models.BooleanField(default=True)
     hire_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Employee list filters. Name prefix search has expression
+            # indexes that differ per database; see migration 0010.
+            models.Index(fields=["is_active", "worker_type"], name="employee_active_type_idx"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
 
+class EmployeeRate(models.Model):
+    """
+    Pay rate of an employee from ``effective_from`` until the next row. The
+    earliest row also covers any dates before it. Maintained by payroll.rates.
+    """
+
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="rate_history"
+    )
+    worker_type = models.CharField(max_length=10, choices=Employee.WORKER_TYPE_CHOICES)
+    hourly_rate = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    daily_rate = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    effective_from = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["employee", "-effective_from"]
+        constraints = [
+            # Also the index for point-in-time lookups.
+            models.UniqueConstraint(
+                fields=["employee", "effective_from"], name="employeerate_effective_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Rate for {self.employee} from {self.effective_from}"
+
+
 class PayrollRun(models.Model):
     payroll_period_start = models.DateField()
     payroll_period_end = models.DateField()
@@ -33,10 +73,14 @@ class PayrollRun(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     is_closed = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ("payroll_period_start", "payroll_period_end")
         ordering = ["-date_processed"]
+        indexes = [
+            models.Index(fields=["-date_processed"], name="payrollrun_processed_idx"),
+        ]
 
     def __str__(self):
         return f"Payroll Run: {self.payroll_period_start} to {self.payroll_period_end}"
@@ -74,6 +118,7 @@ class WorkEntry(models.Model):
     payment_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     gross_pay = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total_deductions = models.DecimalField(
         max_digits=10, decimal_places=2, default=0.00
@@ -83,6 +128,263 @@ class WorkEntry(models.Model):
     class Meta:
         unique_together = ("employee", "payroll_period_start", "payroll_period_end")
         ordering = ["-payroll_period_start"]
+        indexes = [
+            # Work entry list pages (keyset on period start, id).
+            models.Index(
+                fields=["-payroll_period_start", "-id"], name="workentry_period_id_idx"
+            ),
+            # Entries of one run, paged by period (also serves close).
+            models.Index(
+                fields=["payroll_run", "-payroll_period_start", "-id"],
+                name="workentry_run_period_idx",
+            ),
+            # calculate_payroll and other whole-period lookups.
+            models.Index(
+                fields=["payroll_period_start", "payroll_period_end"],
+                name="workentry_period_idx",
+            ),
+            models.Index(
+                fields=["payroll_period_start", "payroll_period_end"],
+                condition=models.Q(is_paid=False),
+                name="workentry_unpaid_period_idx",
+            ),
+            models.Index(fields=["payment_type", "is_paid"], name="workentry_payment_idx"),
+        ]
 
     def __str__(self):
         return f"WorkEntry for {self.employee} from {self.payroll_period_start} to {self.payroll_period_end}"
+
+
+class PayrollCloseJob(models.Model):
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    payroll_run = models.ForeignKey(
+        PayrollRun, on_delete=models.CASCADE, related_name="close_jobs"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    entries_total = models.PositiveIntegerField(default=0)
+    entries_processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["payroll_run", "-created_at"], name="closejob_run_created_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Close job {self.pk} for {self.payroll_run} ({self.status})"
+
+
+class PayrollCloseBatch(models.Model):
+    """
+    A batch close request: every run it named, in order, with the close job
+    queued for it or the reason it was skipped. See payroll.jobs.batch_status.
+    """
+
+    runs = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class PayrollRunTotals(models.Model):
+    """Materialized per-run totals, maintained by payroll.totals."""
+
+    payroll_run = models.OneToOneField(
+        PayrollRun, on_delete=models.CASCADE, related_name="totals"
+    )
+    entry_count = models.PositiveIntegerField(default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_days = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_gross = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    total_net = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Totals for {self.payroll_run}"
+
+
+class EmployeePeriodTotals(models.Model):
+    """
+    Materialized per-employee totals for one calendar month (by payroll
+    period start), maintained by payroll.totals.
+    """
+
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="period_totals"
+    )
+    month = models.DateField()
+    entry_count = models.PositiveIntegerField(default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_days = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_gross = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    total_net = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "month")
+        ordering = ["-month"]
+
+    def __str__(self):
+        return f"Totals for {self.employee} in {self.month:%Y-%m}"
+
+
+class TableVersion(models.Model):
+    """
+    Write counter of a busy table, one row per slot, bumped by database
+    triggers on every insert, update and delete (see payroll.conditional).
+    """
+
+    table = models.CharField(max_length=63)
+    slot = models.PositiveSmallIntegerField()
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("table", "slot")
+
+    def __str__(self):
+        return f"{self.table}[{self.slot}] at {self.version}"
+
+
+class DetachedMonth(models.Model):
+    """
+    A month of work entries detached into an archive table by
+    payroll.partitions; its totals are kept as they were (see payroll.totals).
+    """
+
+    month = models.DateField(unique=True)
+    table = models.CharField(max_length=63)
+    detached_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["month"]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} in {self.table}"
+
+
+class DeductionRule(models.Model):
+    """
+    A deduction or withholding taken from each work entry's pay when it is
+    computed. Rules apply in ``order``; see payroll.deductions.
+    """
+
+    KIND_CHOICES = [
+        ("percentage", "Percentage"),
+        ("flat", "Flat amount"),
+        ("bracket", "Bracketed table"),
+    ]
+    BASE_CHOICES = [
+        ("gross", "Gross pay"),
+        ("net", "Pay left after earlier rules"),
+    ]
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    # Empty applies to every worker type.
+    worker_type = models.CharField(
+        max_length=10, choices=Employee.WORKER_TYPE_CHOICES, null=True, blank=True
+    )
+    base = models.CharField(max_length=5, choices=BASE_CHOICES, default="gross")
+    # Percent of the base, for "percentage" rules.
+    rate = models.DecimalField(max_digits=6, decimal_places=3, null=True, blank=True)
+    # Per entry, for "flat" rules.
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Marginal percent per band, for "bracket" rules:
+    # [{"up_to": "500.00", "rate": "0"}, {"up_to": null, "rate": "12.5"}]
+    brackets = models.JSONField(default=list, blank=True)
+    # Largest amount the rule takes from one entry.
+    cap = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    order = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["order", "id"]
+
+    def __str__(self):
+        return self.name
+
+
+class AuditQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError("The payroll audit log is append-only.")
+
+    def delete(self):
+        raise TypeError("The payroll audit log is append-only.")
+
+
+class PayrollAuditEvent(models.Model):
+    """
+    Append-only record of a change to work entry pay or a payroll run,
+    written by the services layer through payroll.audit. References are not
+    foreign key constraints, so the trail outlives the rows it describes.
+    """
+
+    ACTION_CHOICES = [
+        ("entry_paid", "Work entry pay computed"),
+        ("run_calculated", "Payroll calculated"),
+        ("run_closed", "Payroll run closed"),
+    ]
+
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    payroll_run = models.ForeignKey(
+        PayrollRun,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    work_entry = models.ForeignKey(
+        WorkEntry,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    # {"field": [before, after]} for the fields the change affected.
+    changes = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = AuditQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # History of one run or one employee, newest first (keyset on id).
+            models.Index(fields=["payroll_run", "-id"], name="audit_run_id_idx"),
+            models.Index(fields=["employee", "-id"], name="audit_employee_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("The payroll audit log is append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("The payroll audit log is append-only.")
+
+    def __str__(self):
+        return f"{self.get_action_display()} at {self.created_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,119 @@
+# clearops/backend/payroll/pagination.py
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset ("seek") pagination.
+
+    Unlike DRF's CursorPagination, which only seeks on the first ordering
+    field and falls back to OFFSET for ties, the cursor holds the values of
+    every ordering field of the last row, so each page is a single indexed
+    range query however deep the client pages. All ordering fields must
+    sort in the same direction and end with a unique field.
+
+    ``?ordering=`` picks one of ``orderings``; anything else falls back to
+    the default ``ordering``. Every choice must be served by an index.
+    """
+
+    ordering = ("-payroll_period_start", "-id")
+    orderings = {
+        "-payroll_period_start": ("-payroll_period_start", "-id"),
+        "payroll_period_start": ("payroll_period_start", "id"),
+    }
+    ordering_query_param = "ordering"
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.orderings.get(
+            request.query_params.get(self.ordering_query_param), self.ordering
+        )
+        self.descending = self.ordering[0].startswith("-")
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def seek_filter(self, values):
+        lookup = "lt" if self.descending else "gt"
+        clauses = []
+        for i, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:i], values[:i]))
+            clauses.append(Q(**equal, **{f"{field}__{lookup}": values[i]}))
+        return reduce(or_, clauses)
+
+    def encode_cursor(self, instance):
+        values = [str(getattr(instance, field)) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class AuditEventPagination(KeysetPagination):
+    """Audit events newest first; ids grow with time."""
+
+    ordering = ("-id",)
+    orderings = {"-id": ("-id",), "id": ("id",)}
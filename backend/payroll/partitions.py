@@ -0,0 +1,180 @@
+# clearops/backend/payroll/partitions.py
+"""
+Monthly range partitions of the work entry table and their archive tier.
+
+On PostgreSQL, migration 0013 makes ``payroll_workentry`` a table
+partitioned by range of ``payroll_period_start``: one partition per month,
+named ``payroll_workentry_pYYYY_MM``, plus a default partition catching
+rows of months that have none. Queries filtered on the period -- the
+current periods that almost all activity touches -- only read their
+months' partitions, and each partition is vacuumed on its own, so neither
+slows down as history grows. The table keeps its name, so the ORM and raw
+SQL are unchanged.
+
+Maintenance, run by the ``partition_work_entries`` command:
+
+    ensure_partitions  -- creates partitions from this month to ``ahead``
+                          months out, and for any month with rows in the
+                          default partition (moving those rows over)
+    archive_partition  -- for a past month whose entries all belong to
+                          closed runs: freezes and analyzes it once (later
+                          vacuums skip it) and optionally moves it to an
+                          archive tablespace; it stays attached and queryable
+    detach_partition   -- removes such a month from the table altogether,
+                          keeping its rows in ``payroll_workentry_archive_YYYY_MM``
+                          and recording the month as a DetachedMonth; its
+                          entries then leave the API, while its totals are
+                          kept (``rebuild_totals`` and ``check_totals`` leave
+                          detached months alone) and the audit log is untouched
+
+Other databases (SQLite in tests and local development) keep a plain
+table: ``is_partitioned()`` is False there, and the maintenance functions
+do nothing, while ``archivable_months()`` works everywhere.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+from .conditional import bump_write_version
+from .models import DetachedMonth, WorkEntry
+
+TABLE = WorkEntry._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+ARCHIVED_COMMENT = "archived"
+
+
+def month_after(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def archive_name(month):
+    return f"{TABLE}_archive_{month:%Y_%m}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions():
+    """
+    ``{month: archived}`` of the attached monthly partitions; empty when
+    the table is not partitioned.
+    """
+    if not is_partitioned():
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, obj_description(c.oid, 'pg_class') FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    prefix = f"{TABLE}_p"
+    return {
+        date(int(name[-7:-3]), int(name[-2:]), 1): comment == ARCHIVED_COMMENT
+        for name, comment in rows
+        if name.startswith(prefix)
+    }
+
+
+def _default_months():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', payroll_period_start)::date "
+            f"FROM {DEFAULT_PARTITION}"
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(ahead=3, today=None):
+    """
+    Creates the missing partitions from this month to ``ahead`` months out
+    and for months with rows in the default partition. Returns the months
+    created.
+    """
+    if not is_partitioned():
+        return []
+    month = (today or date.today()).replace(day=1)
+    wanted = set()
+    for _ in range(ahead + 1):
+        wanted.add(month)
+        month = month_after(month)
+    wanted |= _default_months()
+
+    created = sorted(wanted - set(partitions()))
+    for month in created:
+        _create_partition(month)
+    return created
+
+
+def _create_partition(month):
+    name, bounds = partition_name(month), f"FROM ('{month}') TO ('{month_after(month)}')"
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Attaching a range the default partition has rows for fails, so
+        # they are moved into the new table first.
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE payroll_period_start >= %s AND payroll_period_start < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [month, month_after(month)],
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}")
+
+
+def archivable_months(today=None):
+    """
+    Months before the current one that have work entries, all of them in
+    closed payroll runs (one grouped query).
+    """
+    this_month = (today or date.today()).replace(day=1)
+    months = (
+        WorkEntry.objects.filter(payroll_period_start__lt=this_month)
+        .annotate(month=TruncMonth("payroll_period_start"))
+        .values("month")
+        .annotate(open=Count("id", filter=~Q(payroll_run__is_closed=True)))
+        .order_by("month")
+    )
+    return [row["month"] for row in months if row["open"] == 0]
+
+
+def archive_partition(month, tablespace=None):
+    """
+    Freezes and analyzes a month's partition, moving it to ``tablespace``
+    if given, and marks it archived. Must run outside a transaction
+    (VACUUM cannot run inside one).
+    """
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        if tablespace:
+            cursor.execute(f'ALTER TABLE {name} SET TABLESPACE "{tablespace}"')
+        cursor.execute(f"VACUUM (FREEZE, ANALYZE) {name}")
+        cursor.execute(f"COMMENT ON TABLE {name} IS %s", [ARCHIVED_COMMENT])
+
+
+def detach_partition(month):
+    """
+    Detaches a month's partition and renames it to ``archive_name(month)``;
+    the rows stay in that table, outside WorkEntry, and the month is
+    recorded as detached.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {partition_name(month)}")
+        cursor.execute(f"ALTER TABLE {partition_name(month)} RENAME TO {archive_name(month)}")
+        DetachedMonth.objects.create(month=month, table=archive_name(month))
+        # Entries left WorkEntry without a DELETE the version triggers see.
+        bump_write_version(WorkEntry)
@@ -0,0 +1,33 @@
+# clearops/backend/payroll/processes.py
+"""
+Worker process pools for CPU-bound payroll work (see payroll.jobs).
+
+Kept free of model imports: a spawned worker unpickles the initializer
+before Django is set up, and importing this module must not need the app
+registry.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connections
+
+
+def _init_process(database_name):
+    django.setup()
+    # The parent's database, which under tests is not the one settings name.
+    connections["default"].settings_dict["NAME"] = database_name
+
+
+def process_pool(workers):
+    """
+    A pool of ``workers`` processes with Django set up, on the current
+    default database. Processes are spawned, not forked, so no connection or
+    lock is inherited from the parent.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_process,
+        initargs=(connections["default"].settings_dict["NAME"],),
+    )
@@ -0,0 +1,413 @@
+# clearops/backend/payroll/rates.py
+"""
+Effective-dated employee pay rates and their in-process cache.
+
+Each change to an employee's ``worker_type``, ``hourly_rate`` or
+``daily_rate`` is recorded as an EmployeeRate row effective from the day of
+the change, so a payroll period is always paid at the rates in effect on its
+start date, however the employee has changed since. ``effective_rates``
+resolves the row in effect on a date for any number of employees in one
+query, each lookup an index seek on (employee, effective_from).
+
+Resolved rates are kept in a bounded LRU keyed by (employee id, date); misses
+are loaded for a whole batch of ids in one query. An optional shared layer
+uses Django's cache framework (the ``default`` alias, shared between
+workers when DJANGO_CACHE_URL is set, see config/settings.py). It holds a
+version number that every invalidation bumps. Shared entries are keyed by
+that version and local entries are dropped once it moves on, so processes
+sharing a cache backend see each other's rate changes. Rates change rarely
+compared with how often payroll reads them, so any change simply starts a
+new version.
+
+Rates can be recorded ahead of time; the Employee rate columns hold the
+rate in effect today. ``rate_columns.ensure_current()``, called by the
+views serving employees, copies a scheduled rate into them on the first
+request of the day it takes effect.
+
+Employee and EmployeeRate saves and deletes record history and invalidate
+through model signals. An Employee save records a rate only when it changes
+a rate field, and never replaces a rate already recorded for that day
+unless it is the rate being changed: a scheduled rate that has taken effect
+is kept, and the save is refused with RateConflict if it would change it.
+Queryset ``update()`` calls bypass signals; call ``rate_cache.clear()``
+after them.
+
+Settings:
+    PAYROLL_RATE_CACHE_SIZE   -- maximum number of (employee, date) rates kept in process
+    PAYROLL_RATE_CACHE_ALIAS  -- cache alias of the shared layer; empty disables it
+"""
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Employee, EmployeeRate
+
+VERSION_KEY = "payroll-rates:version"
+RATE_FIELDS = ("worker_type", "hourly_rate", "daily_rate")
+# Entries of superseded versions are never read again; let them expire.
+SHARED_TIMEOUT = 24 * 60 * 60
+
+
+class Rate(NamedTuple):
+    worker_type: str
+    hourly_rate: object
+    daily_rate: object
+
+
+class RateConflict(ValueError):
+    pass
+
+
+def effective_rates(employee_ids, on_date):
+    """EmployeeRate rows in effect on ``on_date``, one per employee, in one query."""
+    history = EmployeeRate.objects.filter(employee_id=OuterRef("employee_id"))
+    return EmployeeRate.objects.filter(employee_id__in=employee_ids).filter(
+        effective_from=Coalesce(
+            Subquery(
+                history.filter(effective_from__lte=on_date)
+                .order_by("-effective_from")
+                .values("effective_from")[:1]
+            ),
+            Subquery(history.order_by("effective_from").values("effective_from")[:1]),
+        )
+    )
+
+
+def rate_at(field, on):
+    """
+    SQL expression for a work entry's employee's ``field`` (one of
+    RATE_FIELDS) in effect on ``on``, a date or an expression such as
+    ``OuterRef("payroll_period_start")``. Falls back like ``load_rates``.
+    """
+    history = EmployeeRate.objects.filter(employee_id=OuterRef("employee_id"))
+    return Coalesce(
+        Subquery(
+            history.filter(effective_from__lte=on)
+            .order_by("-effective_from")
+            .values(field)[:1]
+        ),
+        Subquery(history.order_by("effective_from").values(field)[:1]),
+        F(f"employee__{field}"),
+    )
+
+
+def load_rates(employee_ids, on_date):
+    """
+    Returns ``{employee_id: Rate}`` in effect on ``on_date``. Employees
+    without any recorded history fall back to their current rate.
+    """
+    employee_ids = set(employee_ids)
+    rates = {
+        employee_id: Rate(*values)
+        for employee_id, *values in effective_rates(employee_ids, on_date)
+        .order_by()
+        .values_list("employee_id", *RATE_FIELDS)
+    }
+    missing = employee_ids - rates.keys()
+    if missing:
+        for employee_id, *values in Employee.objects.filter(pk__in=missing).values_list(
+            "id", *RATE_FIELDS
+        ):
+            rates[employee_id] = Rate(*values)
+    return rates
+
+
+def _rate_of(instance):
+    return Rate(*(getattr(instance, field) for field in RATE_FIELDS))
+
+
+def _check_replaceable(recorded, previous):
+    if _rate_of(recorded) != previous:
+        raise RateConflict(
+            f"A different rate is already recorded from {recorded.effective_from}; "
+            "change the employee's rate history instead."
+        )
+
+
+def record_rate(employee, effective_from=None, previous=None):
+    """
+    Records the employee's current rate as effective from ``effective_from``
+    (today by default), unless that is already the rate in effect then. A
+    rate recorded for that day is only replaced if it is ``previous``, the
+    rate being changed; otherwise RateConflict is raised.
+    """
+    effective_from = effective_from or timezone.localdate()
+    current = _rate_of(employee)
+    recorded = EmployeeRate.objects.filter(
+        employee=employee, effective_from=effective_from
+    ).first()
+    if recorded is None:
+        in_effect = (
+            effective_rates([employee.pk], effective_from).values_list(*RATE_FIELDS).first()
+        )
+        if in_effect is not None and Rate(*in_effect) == current:
+            return None
+        return EmployeeRate.objects.create(
+            employee=employee, effective_from=effective_from, **current._asdict()
+        )
+    if _rate_of(recorded) == current:
+        return None
+    _check_replaceable(recorded, previous)
+    for field, value in current._asdict().items():
+        setattr(recorded, field, value)
+    recorded.save(update_fields=RATE_FIELDS)
+    return recorded
+
+
+class RateCache:
+    def __init__(self, max_size=None, cache_alias=None):
+        self.max_size = max_size or getattr(settings, "PAYROLL_RATE_CACHE_SIZE", 10_000)
+        if cache_alias is None:
+            cache_alias = getattr(settings, "PAYROLL_RATE_CACHE_ALIAS", "default")
+        self.cache_alias = cache_alias or None
+        self._lock = threading.Lock()
+        self._rates = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def get(self, employee_id, on=None):
+        return self.get_many([employee_id], on).get(employee_id)
+
+    def get_many(self, employee_ids, on=None):
+        """
+        Returns ``{employee_id: Rate}`` in effect on ``on`` (default today).
+        Ids not cached are loaded with a single query; ids of deleted
+        employees are omitted.
+        """
+        on = on or timezone.localdate()
+        employee_ids = set(employee_ids)
+        self._check_version()
+
+        found = {}
+        with self._lock:
+            for employee_id in employee_ids:
+                rate = self._rates.get((employee_id, on))
+                if rate is not None:
+                    self._rates.move_to_end((employee_id, on))
+                    found[employee_id] = rate
+
+        missing = employee_ids - found.keys()
+        if missing and self.shared is not None:
+            shared = self.shared.get_many([self._key(i, on) for i in missing])
+            for employee_id in list(missing):
+                rate = shared.get(self._key(employee_id, on))
+                if rate is not None:
+                    found[employee_id] = Rate(*rate)
+                    missing.discard(employee_id)
+
+        loaded = load_rates(missing, on) if missing else {}
+        if self.shared is not None and loaded:
+            self.shared.set_many(
+                {self._key(i, on): tuple(rate) for i, rate in loaded.items()},
+                timeout=SHARED_TIMEOUT,
+            )
+
+        with self._lock:
+            self.hits += len(employee_ids) - len(missing)
+            self.misses += len(missing)
+        rates = {**found, **loaded}
+        self._store(on, rates)
+        return rates
+
+    def _key(self, employee_id, on):
+        return f"payroll-rate:{self._version}:{employee_id}:{on.isoformat()}"
+
+    def _store(self, on, rates):
+        with self._lock:
+            for employee_id, rate in rates.items():
+                self._rates[(employee_id, on)] = rate
+                self._rates.move_to_end((employee_id, on))
+            while len(self._rates) > self.max_size:
+                self._rates.popitem(last=False)
+
+    def _check_version(self):
+        if self.shared is None:
+            return
+        version = self.shared.get(VERSION_KEY, 0)
+        if version != self._version:
+            with self._lock:
+                self._rates.clear()
+                self._version = version
+
+    def _bump_version(self):
+        try:
+            self.shared.incr(VERSION_KEY)
+        except ValueError:
+            self.shared.add(VERSION_KEY, 1, timeout=None)
+
+    def invalidate(self, employee_id):
+        with self._lock:
+            for key in [key for key in self._rates if key[0] == employee_id]:
+                del self._rates[key]
+        if self.shared is not None:
+            self._bump_version()
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+        if self.shared is not None:
+            self._bump_version()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._rates),
+                "max_size": self.max_size,
+            }
+
+
+rate_cache = RateCache()
+
+
+def sync_rate_columns(on=None, since=None):
+    """
+    Copies the rate in effect on ``on`` (default today) into the Employee
+    rate columns wherever they differ, so that rates scheduled ahead show up
+    in the API and snapshots once they take effect. With ``since`` only
+    employees with a rate effective after it are checked. Bumps
+    ``updated_at`` of the employees changed and returns their number.
+    """
+    on = on or timezone.localdate()
+    employees = Employee.objects.all()
+    if since is not None:
+        employees = employees.filter(
+            rate_history__effective_from__gt=since, rate_history__effective_from__lte=on
+        )
+    ids = employees.values("id")
+    columns = {
+        employee_id: Rate(*values)
+        for employee_id, *values in Employee.objects.filter(pk__in=ids).values_list(
+            "id", *RATE_FIELDS
+        )
+    }
+    if not columns:
+        return 0
+    now = timezone.now()
+    changed = [
+        Employee(pk=employee_id, updated_at=now, **Rate(*values)._asdict())
+        for employee_id, *values in effective_rates(list(columns), on)
+        .order_by()
+        .values_list("employee_id", *RATE_FIELDS)
+        if Rate(*values) != columns[employee_id]
+    ]
+    if changed:
+        # bulk_update skips the Employee signals, which would record the
+        # rates again.
+        Employee.objects.bulk_update(changed, [*RATE_FIELDS, "updated_at"])
+        rate_cache.clear()
+    return len(changed)
+
+
+class _RateColumns:
+    """Runs sync_rate_columns once a day per process, on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._synced_on = None
+
+    def ensure_current(self):
+        today = timezone.localdate()
+        if self._synced_on is not None and today <= self._synced_on:
+            return
+        with self._lock:
+            if self._synced_on is not None and today <= self._synced_on:
+                return
+            sync_rate_columns(today, since=self._synced_on)
+            self._synced_on = today
+
+    def clear(self):
+        with self._lock:
+            self._synced_on = None
+
+
+rate_columns = _RateColumns()
+
+
+def _invalidate_later(employee_id):
+    rate_cache.invalidate(employee_id)
+    # A reader may have cached the old rate before this transaction commits.
+    transaction.on_commit(lambda: rate_cache.invalidate(employee_id))
+
+
+def _loaded_rate(employee):
+    # Deferred fields are left out: reading them would cost a query each.
+    return {
+        field: Employee._meta.get_field(field).to_python(employee.__dict__[field])
+        for field in RATE_FIELDS
+        if field in employee.__dict__
+    }
+
+
+@receiver(post_init, sender=Employee, dispatch_uid="payroll_rates_employee_loaded")
+def _employee_loaded(sender, instance, **kwargs):
+    instance._saved_rate = _loaded_rate(instance)
+
+
+@receiver(pre_save, sender=Employee, dispatch_uid="payroll_rates_employee_saving")
+def _employee_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Works out whether the save changes the rate, and refuses it before
+    anything is written if recording the new rate would conflict.
+    """
+    instance._rate_change = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(RATE_FIELDS):
+        return
+    saved = instance._saved_rate
+    changed = {
+        field: value
+        for field, value in _loaded_rate(instance).items()
+        if field not in saved or saved[field] != value
+    }
+    if not changed:
+        return
+    if len(saved) == len(RATE_FIELDS):
+        previous = Rate(**saved)
+    else:
+        previous = Rate(
+            *Employee.objects.filter(pk=instance.pk).values_list(*RATE_FIELDS).get()
+        )
+    current = previous._replace(**changed)
+    recorded = EmployeeRate.objects.filter(
+        employee=instance, effective_from=timezone.localdate()
+    ).first()
+    if recorded is not None and _rate_of(recorded) != current:
+        _check_replaceable(recorded, previous)
+    instance._rate_change = previous
+
+
+@receiver(post_save, sender=Employee, dispatch_uid="payroll_rates_employee_saved")
+def _employee_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and (created or instance._rate_change is not None):
+        record_rate(instance, previous=instance._rate_change)
+        instance._rate_change = None
+    instance._saved_rate = _loaded_rate(instance)
+    _invalidate_later(instance.pk)
+
+
+@receiver(post_delete, sender=Employee, dispatch_uid="payroll_rates_employee_deleted")
+@receiver(post_save, sender=EmployeeRate, dispatch_uid="payroll_rates_saved")
+@receiver(post_delete, sender=EmployeeRate, dispatch_uid="payroll_rates_deleted")
+def _rate_changed(sender, instance, **kwargs):
+    _invalidate_later(instance.pk if sender is Employee else instance.employee_id)
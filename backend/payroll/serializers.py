@@ -1,6 +1,22 @@
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Employee, WorkEntry, PayrollRun
+from .analytics import DIMENSIONS
+from .deductions import compile_rule
+from .models import (
+    DeductionRule,
+    Employee,
+    EmployeeRate,
+    WorkEntry,
+    PayrollRun,
+    PayrollCloseJob,
+    PayrollAuditEvent,
+    EmployeePeriodTotals,
+)
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -9,6 +25,19 @@ class EmployeeSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class EmployeeRateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EmployeeRate
+        fields = [
+            "id",
+            "worker_type",
+            "hourly_rate",
+            "daily_rate",
+            "effective_from",
+            "created_at",
+        ]
+
+
 class WorkEntrySerializer(serializers.ModelSerializer):
     employee = EmployeeSerializer(read_only=True)
     employee_id = serializers.PrimaryKeyRelatedField(
@@ -46,6 +75,11 @@ class WorkEntrySerializer(serializers.ModelSerializer):
             "net_pay",
         ]
 
+    def validate_payroll_run(self, value):
+        if value is not None and value.is_closed:
+            raise serializers.ValidationError("Payroll run is already closed.")
+        return value
+
     def validation(self, data):
         employee = data.get("employee") or self.instance.employee
         worker_type = employee.worker_type
@@ -77,8 +111,51 @@ class WorkEntrySerializer(serializers.ModelSerializer):
         return data
 
 
+class WorkEntryListSerializer(serializers.ModelSerializer):
+    """Compact read-only representation used by the work entry list."""
+
+    employee_id = serializers.IntegerField(read_only=True)
+    employee_name = serializers.SerializerMethodField()
+    employee_worker_type = serializers.CharField(
+        source="employee.worker_type", read_only=True
+    )
+
+    class Meta:
+        model = WorkEntry
+        fields = [
+            "id",
+            "employee_id",
+            "employee_name",
+            "employee_worker_type",
+            "payroll_run",
+            "payroll_period_start",
+            "payroll_period_end",
+            "hours_worked",
+            "days_worked",
+            "is_paid",
+            "payment_type",
+            "payment_date",
+            "notes",
+            "gross_pay",
+            "total_deductions",
+            "net_pay",
+        ]
+        read_only_fields = fields
+
+    def get_employee_name(self, obj):
+        return f"{obj.employee.first_name} {obj.employee.last_name}"
+
+
 class PayrollRunSerializer(serializers.ModelSerializer):
-    work_entries = WorkEntrySerializer(many=True, read_only=True)
+    """
+    Payroll run with per-run totals. The totals come from annotations on the
+    viewset queryset; entries are served by /payroll-runs/{id}/entries/.
+    """
+
+    entry_count = serializers.IntegerField(read_only=True)
+    paid_count = serializers.IntegerField(read_only=True)
+    total_gross = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    total_net = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = PayrollRun
@@ -86,6 +163,9 @@ class PayrollRunSerializer(serializers.ModelSerializer):
         read_only_fields = ["date_processed", "date_created", "is_closed"]
 
     def validate(self, data):
+        # Closed runs are served as immutable.
+        if self.instance is not None and self.instance.is_closed:
+            raise serializers.ValidationError("Payroll run is already closed.")
         if data["payroll_period_end"] < data["payroll_period_start"]:
             raise serializers.ValidationError(
                 "'payroll_period_end' must be after 'payroll_period_start'."
@@ -97,3 +177,173 @@ class PayrollRunCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = PayrollRun
         fields = ["id", "payroll_period_start", "payroll_period_end", "notes"]
+
+
+class PayrollBatchCloseSerializer(serializers.Serializer):
+    run_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    period_start = serializers.DateField(required=False)
+    period_end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        has_range = "period_start" in data and "period_end" in data
+        if ("run_ids" in data) == has_range:
+            raise serializers.ValidationError(
+                "Provide either run_ids or both period_start and period_end."
+            )
+        if has_range and data["period_start"] > data["period_end"]:
+            raise serializers.ValidationError("period_start must not be after period_end.")
+        return data
+
+
+class PayrollCloseJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source="id", read_only=True)
+
+    class Meta:
+        model = PayrollCloseJob
+        fields = [
+            "job_id",
+            "payroll_run",
+            "status",
+            "entries_processed",
+            "entries_total",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+
+class EmployeePeriodTotalsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EmployeePeriodTotals
+        fields = [
+            "month",
+            "entry_count",
+            "paid_count",
+            "total_hours",
+            "total_days",
+            "total_gross",
+            "total_net",
+        ]
+        read_only_fields = fields
+
+
+class PayrollAnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the analytics report; defaults to year to date."""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    year = serializers.IntegerField(required=False, min_value=1900, max_value=9999)
+    group_by = serializers.CharField(required=False, allow_blank=True, default="")
+    worker_type = serializers.ChoiceField(choices=Employee.WORKER_TYPE_CHOICES, required=False)
+    employee = serializers.IntegerField(required=False)
+    payroll_run = serializers.IntegerField(required=False)
+    closed = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate_group_by(self, value):
+        group_by = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = sorted(set(group_by) - DIMENSIONS.keys())
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown dimension(s) {', '.join(unknown)}; use {', '.join(DIMENSIONS)}."
+            )
+        return list(dict.fromkeys(group_by))
+
+    def validate(self, data):
+        if "year" in data:
+            if "start" in data or "end" in data:
+                raise serializers.ValidationError("Provide either year or start/end, not both.")
+            data["start"] = date(data["year"], 1, 1)
+            data["end"] = date(data.pop("year"), 12, 31)
+        else:
+            today = timezone.localdate()
+            data.setdefault("end", today)
+            data.setdefault("start", date(data["end"].year, 1, 1))
+        if data["start"] > data["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return data
+
+
+def _multiplier(**kwargs):
+    return serializers.DecimalField(
+        max_digits=8, decimal_places=4, min_value=Decimal("0"), **kwargs
+    )
+
+
+class PayrollScenarioSerializer(serializers.Serializer):
+    """One what-if scenario; multipliers compound and default to 1."""
+
+    name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    multiplier = _multiplier(required=False)
+    worker_type = serializers.DictField(child=_multiplier(), required=False)
+    employee = serializers.DictField(child=_multiplier(), required=False)
+    hours_multiplier = _multiplier(required=False)
+
+    def validate_worker_type(self, value):
+        unknown = sorted(set(value) - {code for code, _ in Employee.WORKER_TYPE_CHOICES})
+        if unknown:
+            raise serializers.ValidationError(f"Unknown worker type(s): {', '.join(unknown)}.")
+        return value
+
+    def validate_employee(self, value):
+        if not all(str(key).isdigit() for key in value):
+            raise serializers.ValidationError("Keys must be employee ids.")
+        return {int(key): multiplier for key, multiplier in value.items()}
+
+
+class PayrollSimulationSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    scenarios = PayrollScenarioSerializer(many=True, allow_empty=False)
+
+    def validate_scenarios(self, value):
+        limit = getattr(settings, "PAYROLL_SIMULATION_MAX_SCENARIOS", 1000)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} scenarios per request.")
+        return value
+
+    def validate(self, data):
+        if data["start"] > data["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return data
+
+
+class DeductionRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeductionRule
+        fields = "__all__"
+        read_only_fields = ["updated_at"]
+
+    def validate(self, data):
+        # Compiling the rule is the validation: a rule that saves also compiles.
+        fields = {**self._current_fields(), **data}
+        try:
+            compile_rule(DeductionRule(**fields))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return data
+
+    def _current_fields(self):
+        if self.instance is None:
+            return {}
+        return {
+            field: getattr(self.instance, field)
+            for field in ("kind", "base", "rate", "amount", "brackets", "cap")
+        }
+
+
+class PayrollAuditEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PayrollAuditEvent
+        fields = [
+            "id",
+            "action",
+            "payroll_run",
+            "employee",
+            "work_entry",
+            "changes",
+            "created_at",
+        ]
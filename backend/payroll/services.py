@@ -1,19 +1,371 @@
 # clearops/backend/payroll/services.py
+from collections import defaultdict
+
 from django.db import transaction
+from django.db.models import FilteredRelation, Q, Sum
 from decimal import Decimal
 from django.utils import timezone
 
+from .audit import PAY_FIELDS, AuditBuffer, diff
+from .deductions import deduction_plan
 from .models import Employee, WorkEntry, PayrollRun
+from .rates import RATE_FIELDS, effective_rates, rate_cache
+from .totals import refresh_totals, refresh_totals_for, touched_keys
+
+
+ZERO = Decimal("0.00")
+
+# Rows per UPDATE statement when persisting computed pay on close.
+CLOSE_BATCH_SIZE = 1000
+
+
+class PayrollError(Exception):
+    """Raised when a payroll operation cannot be performed on a run."""
+
+
+def _gross_pay(worker_type, total_hours, total_days, hourly_rate, daily_rate):
+    if worker_type == "hourly":
+        return (total_hours or ZERO) * (hourly_rate or ZERO)
+    if worker_type == "daily":
+        return (total_days or ZERO) * (daily_rate or ZERO)
+    return ZERO
+
+
+def active_employee_period_totals(payroll_period_start, payroll_period_end):
+    """
+    One row per active employee with their summed hours/days for the period.
+    The period is part of the join condition, so only that period's entries
+    are read (via the employee/period unique index).
+    """
+    return (
+        Employee.objects.filter(is_active=True)
+        .annotate(
+            period_entries=FilteredRelation(
+                "work_entries",
+                condition=Q(
+                    work_entries__payroll_period_start=payroll_period_start,
+                    work_entries__payroll_period_end=payroll_period_end,
+                ),
+            ),
+            total_hours=Sum("period_entries__hours_worked"),
+            total_days=Sum("period_entries__days_worked"),
+        )
+        .values(
+            "id",
+            "first_name",
+            "last_name",
+            "total_hours",
+            "total_days",
+        )
+        .order_by("id")
+    )
 
 
 def calculate_payroll(
     payroll_period_start, payroll_period_end, payroll_run: PayrollRun
 ):
     """
-    Processes payroll for all active employees within the specified payroll period.
+    Processes payroll for all active employees within the specified payroll period,
+    at the pay rates in effect on its start date.
+
+    Totals are computed with one aggregate query grouped by employee and
+    worker type, and pay once per employee in Python. The period's work
+    entries are marked paid with a single UPDATE and get their pay from
+    batched UPDATEs, so the cost no longer grows in round trips with headcount.
+    """
+    payment_date = timezone.now().date()
+    employees = list(
+        active_employee_period_totals(payroll_period_start, payroll_period_end)
+    )
+    rates = rate_cache.get_many(
+        (employee["id"] for employee in employees), on=payroll_period_start
+    )
+    plan = deduction_plan()
+
+    with transaction.atomic():
+        payroll_results = []
+        pay_by_employee = {}
+        for employee in employees:
+            rate = rates[employee["id"]]
+            gross_pay, total_deductions, net_pay = plan.apply(
+                _gross_pay(
+                    rate.worker_type,
+                    employee["total_hours"],
+                    employee["total_days"],
+                    rate.hourly_rate,
+                    rate.daily_rate,
+                ),
+                rate.worker_type,
+            )
+            pay_by_employee[employee["id"]] = (gross_pay, total_deductions, net_pay)
+
+            payroll_results.append(
+                {
+                    "employee_id": employee["id"],
+                    "employee_name": f"{employee['first_name']} {employee['last_name']}",
+                    "gross_pay": gross_pay,
+                    "total_deductions": total_deductions,
+                    "net_pay": net_pay,
+                    "payment_type": "bank_transfer",
+                    "payment_date": payment_date,
+                    "payroll_run": payroll_run.id,
+                }
+            )
+
+        period_entries = WorkEntry.objects.filter(
+            employee__is_active=True,
+            payroll_period_start=payroll_period_start,
+            payroll_period_end=payroll_period_end,
+        )
+        keys = list(
+            period_entries.values_list(
+                "id", "employee_id", "payroll_run_id", "payroll_period_start", *PAY_FIELDS
+            ).order_by()
+        )
+        run_ids, employee_months = touched_keys(key[1:4] for key in keys)
+        # Fields that are the same for every entry go out in one statement.
+        period_entries.update(
+            is_paid=True,
+            payment_type="bank_transfer",
+            payment_date=payment_date,
+            payroll_run=payroll_run,
+            updated_at=timezone.now(),
+        )
+        # One entry per employee and period, so each entry's pay is its
+        # employee's, as computed above; written in batched UPDATEs.
+        entries = [
+            WorkEntry(id=entry_id, **dict(zip(PAY_FIELDS, pay_by_employee[employee_id])))
+            for entry_id, employee_id, *_ in keys
+            if employee_id in pay_by_employee
+        ]
+        # Filtered on the period too, so a partitioned table reads one partition.
+        WorkEntry.objects.filter(payroll_period_start=payroll_period_start).bulk_update(
+            entries, PAY_FIELDS, batch_size=CLOSE_BATCH_SIZE
+        )
+        refresh_totals(run_ids | {payroll_run.id}, employee_months)
+
+        audit = AuditBuffer()
+        for entry_id, employee_id, run_id, _, *pay in keys:
+            after = dict(zip(PAY_FIELDS, pay_by_employee.get(employee_id, pay)))
+            after["payroll_run"] = payroll_run.id
+            before = dict(zip(PAY_FIELDS, pay), payroll_run=run_id)
+            audit.record(
+                "entry_paid",
+                diff(before, after),
+                payroll_run_id=payroll_run.id,
+                employee_id=employee_id,
+                work_entry_id=entry_id,
+            )
+        audit.record(
+            "run_calculated",
+            {
+                "period": [str(payroll_period_start), str(payroll_period_end)],
+                "entries": len(keys),
+            },
+            payroll_run_id=payroll_run.id,
+        )
+        audit.flush()
+
+    return payroll_results
+
+
+def close_payroll_run(payroll_run_id, progress=None):
+    """
+    Computes pay for every work entry of a payroll run, marks them paid and
+    closes the run, all inside one transaction holding a row lock on the run.
+
+    Entries are loaded in one query, pay rates come from the rate cache,
+    deductions from the compiled deduction plan (see payroll.deductions), and
+    results are written back with a bounded number of batched UPDATEs,
+    independent of the number of employees involved. ``progress``, if given, is called with
+    ``(entries_processed, entries_total)`` after each batch is written.
+    Audit events are buffered and written in bulk at the end of the same
+    transaction (see payroll.audit).
+    """
+    with transaction.atomic():
+        payroll_run = PayrollRun.objects.select_for_update().get(pk=payroll_run_id)
+        if payroll_run.is_closed:
+            raise PayrollError("Payroll run is already closed.")
+
+        work_entries = list(
+            payroll_run.work_entries.only(
+                "id",
+                "employee_id",
+                "payroll_run_id",
+                "payroll_period_start",
+                "hours_worked",
+                "days_worked",
+                *PAY_FIELDS,
+            ).order_by("id")
+        )
+        if not work_entries:
+            raise PayrollError("No work entries to process.")
+
+        now = timezone.now()
+        # Rates in effect on each period start, so re-closing an old run
+        # reproduces the pay it was computed with.
+        employees_by_period = defaultdict(set)
+        for entry in work_entries:
+            employees_by_period[entry.payroll_period_start].add(entry.employee_id)
+        rates = {
+            period_start: rate_cache.get_many(employee_ids, on=period_start)
+            for period_start, employee_ids in employees_by_period.items()
+        }
+        plan = deduction_plan()
+        audit = AuditBuffer()
+        for entry in work_entries:
+            rate = rates[entry.payroll_period_start][entry.employee_id]
+            before = {field: getattr(entry, field) for field in PAY_FIELDS}
+            entry.gross_pay, entry.total_deductions, entry.net_pay = plan.apply(
+                _gross_pay(
+                    rate.worker_type,
+                    entry.hours_worked,
+                    entry.days_worked,
+                    rate.hourly_rate,
+                    rate.daily_rate,
+                ),
+                rate.worker_type,
+            )
+            audit.record(
+                "entry_paid",
+                diff(before, {field: getattr(entry, field) for field in PAY_FIELDS}),
+                payroll_run_id=payroll_run.id,
+                employee_id=entry.employee_id,
+                work_entry_id=entry.id,
+            )
+
+        total = len(work_entries)
+        # The period filter lets a partitioned table skip other months.
+        run_entries = WorkEntry.objects.filter(payroll_period_start__in=employees_by_period)
+        for offset in range(0, total, CLOSE_BATCH_SIZE):
+            batch = work_entries[offset : offset + CLOSE_BATCH_SIZE]
+            run_entries.bulk_update(batch, ["gross_pay", "total_deductions", "net_pay"])
+            if progress is not None:
+                progress(offset + len(batch), total)
+        # Fields that are the same for every entry go out in one statement.
+        run_entries.filter(payroll_run=payroll_run).update(
+            is_paid=True,
+            payment_type="bank_transfer",
+            payment_date=now.date(),
+            updated_at=now,
+        )
+
+        payroll_run.is_closed = True
+        payroll_run.date_processed = now
+        payroll_run.save(update_fields=["is_closed", "date_processed", "updated_at"])
+        refresh_totals_for(work_entries)
+
+        audit.record(
+            "run_closed",
+            {"is_closed": [False, True], "entries": total},
+            payroll_run_id=payroll_run.id,
+        )
+        audit.flush()
+
+    return payroll_run
+
+
+def check_entry_writable(entry):
+    """
+    Raises PayrollError if ``entry`` is paid or belongs to a closed run:
+    closed runs are served as immutable, so their entries must not change.
+    """
+    if entry.is_paid:
+        raise PayrollError("Work entry is already paid.")
+    if (
+        entry.payroll_run_id is not None
+        and PayrollRun.objects.filter(pk=entry.payroll_run_id, is_closed=True).exists()
+    ):
+        raise PayrollError("Payroll run is already closed.")
+
+
+def save_work_entries(serializer):
+    """
+    Saves a validated WorkEntry serializer (single or ``many=True``) and
+    refreshes the payroll totals it touched, including the entry's previous
+    run/period on update. Raises PayrollError when updating an entry that
+    is paid or in a closed run.
+    """
+    previous = []
+    entry = serializer.instance
+    if isinstance(entry, WorkEntry):
+        check_entry_writable(entry)
+        previous = [(entry.employee_id, entry.payroll_run_id, entry.payroll_period_start)]
+    with transaction.atomic():
+        saved = serializer.save()
+        refresh_totals_for(previous + (saved if isinstance(saved, list) else [saved]))
+    return saved
+
+
+def delete_work_entry(entry):
+    """
+    Deletes a work entry and refreshes the payroll totals it fed. Raises
+    PayrollError if the entry is paid or in a closed run.
+    """
+    check_entry_writable(entry)
+    with transaction.atomic():
+        entry.delete()
+        refresh_totals_for([entry])
+
+
+def delete_with_entries(instance):
+    """
+    Deletes an Employee or PayrollRun, whose work entries go with it, and
+    refreshes the totals those entries fed: the other side's rows (employee
+    months of a run, runs of an employee) outlive the cascade. Raises
+    PayrollError for a closed run or an employee with entries in one.
+    """
+    if isinstance(instance, PayrollRun):
+        if instance.is_closed:
+            raise PayrollError("Payroll run is already closed.")
+    elif instance.work_entries.filter(payroll_run__is_closed=True).exists():
+        raise PayrollError(
+            "Employee has work entries in closed payroll runs; deactivate them instead."
+        )
+    with transaction.atomic():
+        entries = list(
+            instance.work_entries.values_list(
+                "employee_id", "payroll_run_id", "payroll_period_start"
+            ).order_by()
+        )
+        instance.delete()
+        refresh_totals_for(entries)
+
+
+def add_employee_rate(employee, serializer):
+    """
+    Saves a validated EmployeeRateSerializer as a new rate of ``employee``.
+    If it is the rate in effect today, the employee's current rate columns
+    are updated to match; a rate dated ahead reaches them on the day it
+    takes effect (see payroll.rates.rate_columns).
+    """
+    effective_from = serializer.validated_data["effective_from"]
+    if employee.rate_history.filter(effective_from=effective_from).exists():
+        raise PayrollError(f"A rate effective from {effective_from} already exists.")
+
+    with transaction.atomic():
+        rate = serializer.save(employee=employee)
+        if effective_rates([employee.pk], timezone.localdate()).filter(pk=rate.pk).exists():
+            # update() skips the Employee signals, which would record the
+            # rate a second time.
+            Employee.objects.filter(pk=employee.pk).update(
+                updated_at=timezone.now(),
+                **{field: getattr(rate, field) for field in RATE_FIELDS},
+            )
+    return rate
+
+
+def calculate_payroll_per_employee(
+    payroll_period_start, payroll_period_end, payroll_run: PayrollRun
+):
+    """
+    Original per-employee implementation of calculate_payroll: one query and
+    one UPDATE per active employee. Kept as the reference the set-based engine
+    is benchmarked against (see the benchmark_payroll command).
     """
     # Fetch all active employees
-    employees = Employee.objects.filter(is_active=True)
+    employees = Employee.objects.filter(is_active=True).order_by("id")
+    plan = deduction_plan()
 
     payroll_results = []
 
@@ -34,18 +386,16 @@ def calculate_payroll(
             elif employee.worker_type == "daily":
                 total_days += we.days_worked or 0
 
-        # Calculate gross pay
-        if employee.worker_type == "hourly":
-            gross_pay = total_hours * employee.hourly_rate
-        elif employee.worker_type == "daily":
-            gross_pay = total_days * employee.daily_rate
-        else:
-            gross_pay = Decimal("0.00")
-
-        # Here, you can add logic for deductions, taxes, etc.
-        # For simplicity, we'll assume net_pay = gross_pay
-
-        net_pay = gross_pay  # Placeholder for actual deduction logic
+        gross_pay, total_deductions, net_pay = plan.apply(
+            _gross_pay(
+                employee.worker_type,
+                total_hours,
+                total_days,
+                employee.hourly_rate,
+                employee.daily_rate,
+            ),
+            employee.worker_type,
+        )
 
         # Update WorkEntrys as paid
         with transaction.atomic():
@@ -54,14 +404,15 @@ def calculate_payroll(
                 payment_type="bank_transfer",
                 payment_date=timezone.now().date(),
                 payroll_run=payroll_run,
+                updated_at=timezone.now(),
             )
 
-        # Append the result
         payroll_results.append(
             {
                 "employee_id": employee.id,
                 "employee_name": f"{employee.first_name} {employee.last_name}",
                 "gross_pay": gross_pay,
+                "total_deductions": total_deductions,
                 "net_pay": net_pay,
                 "payment_type": "bank_transfer",
                 "payment_date": timezone.now().date(),
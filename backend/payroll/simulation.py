@@ -0,0 +1,232 @@
+# clearops/backend/payroll/simulation.py
+"""
+Read-only "what if" payroll simulation over rate and hours scenarios.
+
+The work entries of a date range are loaded in one query -- each with the
+rate in effect on its period start, resolved in SQL with
+``payroll.rates.rate_at`` -- into columnar NumPy arrays of integers: units
+worked (hours for hourly workers, days for daily ones) in hundredths and the
+applicable rate in cents. Nothing is written.
+
+A scenario scales rates by a global ``multiplier``, per ``worker_type`` and
+per ``employee`` multipliers (which compound), and units by
+``hours_multiplier``. All arithmetic is on int64 so every scenario is exact
+to the cent, rounding half up at the same points the database does when
+a run is closed: the scaled rate, the scaled units and each entry's gross
+pay are each rounded to two places. A multiplier is applied as parts per
+million, so compounded multipliers are rounded to six places first.
+
+Scenarios are evaluated in batches of ``(scenarios x entries)`` matrices of
+at most SIMULATION_BATCH_ELEMENTS elements, so memory stays bounded however
+many scenarios are asked for.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.db.models import OuterRef
+
+from .models import Employee, WorkEntry
+from .rates import rate_at
+
+SIMULATION_BATCH_ELEMENTS = 1_000_000
+WORKER_TYPES = [code for code, _ in Employee.WORKER_TYPE_CHOICES]
+PPM = 1_000_000
+ONE = Decimal("1")
+
+
+class PeriodData:
+    """
+    Work entries of a range as parallel arrays, sorted by worker type so
+    per-type totals are slice sums. Entries sharing a worker type and rate
+    share a ``rate_code``, so scenario rates are scaled once per distinct
+    rate rather than once per entry.
+    """
+
+    def __init__(self, employee_ids, type_index, units, rates):
+        order = np.argsort(type_index, kind="stable")
+        self.type_index = type_index[order]
+        self.units = units[order]
+        self.rates = rates[order]
+        self.employee_ids, self.employee_index = np.unique(
+            employee_ids[order], return_inverse=True
+        )
+        bounds = np.searchsorted(self.type_index, np.arange(len(WORKER_TYPES) + 1))
+        self.type_slices = {
+            worker_type: slice(bounds[i], bounds[i + 1])
+            for i, worker_type in enumerate(WORKER_TYPES)
+        }
+
+        keys, self.rate_code = np.unique(
+            np.stack([self.type_index, self.rates]), axis=1, return_inverse=True
+        )
+        self.code_type, self.code_rate = keys
+        self.rate_code = self.rate_code.reshape(-1)
+
+        self._by_employee = np.argsort(self.employee_index, kind="stable")
+        self._employee_bounds = np.searchsorted(
+            self.employee_index[self._by_employee], np.arange(len(self.employee_ids) + 1)
+        )
+        self._employee_position = {
+            int(employee_id): i for i, employee_id in enumerate(self.employee_ids)
+        }
+
+    def __len__(self):
+        return len(self.units)
+
+    def entries_of(self, employee_id):
+        """Indices of the employee's entries (empty if they have none)."""
+        i = self._employee_position.get(int(employee_id))
+        if i is None:
+            return self._by_employee[:0]
+        return self._by_employee[self._employee_bounds[i] : self._employee_bounds[i + 1]]
+
+
+def _hundredths(value):
+    return int((Decimal(value or 0) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def load_period_data(start, end):
+    """Entries with a period starting in ``start``..``end``, in one query."""
+    on = OuterRef("payroll_period_start")
+    rows = (
+        WorkEntry.objects.filter(payroll_period_start__gte=start, payroll_period_start__lte=end)
+        .annotate(
+            rate_worker_type=rate_at("worker_type", on),
+            rate_hourly=rate_at("hourly_rate", on),
+            rate_daily=rate_at("daily_rate", on),
+        )
+        .order_by()
+        .values_list(
+            "employee_id",
+            "hours_worked",
+            "days_worked",
+            "rate_worker_type",
+            "rate_hourly",
+            "rate_daily",
+        )
+    )
+    employee_ids, type_index, units, rates = [], [], [], []
+    other = len(WORKER_TYPES)
+    for employee_id, hours, days, worker_type, hourly_rate, daily_rate in rows.iterator(
+        chunk_size=10_000
+    ):
+        employee_ids.append(employee_id)
+        if worker_type == "hourly":
+            type_index.append(WORKER_TYPES.index("hourly"))
+            units.append(_hundredths(hours))
+            rates.append(_hundredths(hourly_rate))
+        elif worker_type == "daily":
+            type_index.append(WORKER_TYPES.index("daily"))
+            units.append(_hundredths(days))
+            rates.append(_hundredths(daily_rate))
+        else:
+            type_index.append(other)
+            units.append(0)
+            rates.append(0)
+    return PeriodData(
+        np.array(employee_ids, dtype=np.int64),
+        np.array(type_index, dtype=np.int64),
+        np.array(units, dtype=np.int64),
+        np.array(rates, dtype=np.int64),
+    )
+
+
+def _ppm(value):
+    return int(Decimal(value).quantize(Decimal("0.000001"), rounding=ROUND_HALF_UP) * PPM)
+
+
+def _scale(values, ppm):
+    """``values * ppm / 1e6`` rounded half up (all non-negative)."""
+    return (values * ppm + PPM // 2) // PPM
+
+
+def _type_ppm(scenarios):
+    """Rate ppm per scenario and worker type (global x type); unknown types stay 1."""
+    table = np.full((len(scenarios), len(WORKER_TYPES) + 1), PPM, dtype=np.int64)
+    for s, scenario in enumerate(scenarios):
+        multiplier = Decimal(scenario.get("multiplier", ONE))
+        by_type = scenario.get("worker_type", {})
+        for t, worker_type in enumerate(WORKER_TYPES):
+            table[s, t] = _ppm(multiplier * Decimal(by_type.get(worker_type, ONE)))
+    return table
+
+
+def _cents(value):
+    return f"{Decimal(int(value)) / 100:.2f}"
+
+
+def simulate(data, scenarios):
+    """
+    Gross pay of ``data`` under each scenario. Returns, per scenario, the
+    total and per worker type totals in cents (int64 arrays of shape
+    ``(len(scenarios),)``), keyed ``"total"`` and by worker type.
+    """
+    totals = {"total": np.zeros(len(scenarios), dtype=np.int64)}
+    totals.update({t: np.zeros(len(scenarios), dtype=np.int64) for t in WORKER_TYPES})
+    if not scenarios or not len(data):
+        return totals
+
+    batch = max(1, SIMULATION_BATCH_ELEMENTS // len(data))
+    for first in range(0, len(scenarios), batch):
+        chunk = scenarios[first : first + batch]
+        type_ppm = _type_ppm(chunk)
+        # Scenario rate of every distinct (type, rate), then of every entry.
+        code_rates = _scale(data.code_rate, type_ppm[:, data.code_type])
+        gross = np.take(code_rates, data.rate_code, axis=1)
+
+        for s, scenario in enumerate(chunk):
+            for employee_id, multiplier in scenario.get("employee", {}).items():
+                entries = data.entries_of(employee_id)
+                if len(entries):
+                    ppm = _scale(type_ppm[s, data.type_index[entries]], _ppm(multiplier))
+                    gross[s, entries] = _scale(data.rates[entries], ppm)
+
+        units_ppm = np.array(
+            [[_ppm(scenario.get("hours_multiplier", ONE))] for scenario in chunk],
+            dtype=np.int64,
+        )
+        if (units_ppm == PPM).all():
+            gross *= data.units
+        else:
+            gross *= _scale(data.units, units_ppm)
+        gross += 50
+        gross //= 100
+
+        rows = slice(first, first + len(chunk))
+        totals["total"][rows] = gross.sum(axis=1)
+        for worker_type, columns in data.type_slices.items():
+            totals[worker_type][rows] = gross[:, columns].sum(axis=1)
+    return totals
+
+
+def simulate_payroll(start, end, scenarios):
+    """
+    Loads the range and evaluates a baseline (all multipliers 1) plus
+    ``scenarios``; amounts are formatted as strings of exact cents.
+    """
+    data = load_period_data(start, end)
+    totals = simulate(data, [{}] + list(scenarios))
+    baseline = int(totals["total"][0])
+
+    def summary(i):
+        total = int(totals["total"][i])
+        return {
+            "total_gross": _cents(total),
+            "difference": _cents(total - baseline),
+            "change_percent": (
+                f"{Decimal(total - baseline) * 100 / baseline:.2f}" if baseline else None
+            ),
+            "by_worker_type": {t: _cents(totals[t][i]) for t in WORKER_TYPES},
+        }
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "entries": len(data),
+        "employees": len(data.employee_ids),
+        "baseline": summary(0),
+        "scenarios": [
+            {"name": scenario.get("name") or f"scenario {i}", **summary(i)}
+            for i, scenario in enumerate(scenarios, start=1)
+        ],
+    }
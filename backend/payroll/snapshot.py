@@ -0,0 +1,100 @@
+# clearops/backend/payroll/snapshot.py
+"""
+Compact, versioned snapshot of the employee directory for the frontend.
+
+The snapshot is columnar -- one array per field, read with ``values_list``
+and no serializer -- and carries a ``version`` token: the directory's row
+count, highest id and latest ``updated_at``. Passing it back as ``since``
+returns only the employees changed (including deactivated) after it.
+
+Hard deletes cannot be listed in a delta, so they are detected instead:
+every employee that existed at the token has an id up to its highest id,
+and if fewer of those remain than the token counted, a full snapshot is
+returned (``"delta": false``) for the client to replace its copy with.
+Deltas reach back SNAPSHOT_OVERLAP before the token, so a change committed
+just after a snapshot was read with an earlier ``updated_at`` is not
+missed; clients merge by id, so the overlap is harmless.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max, Q
+
+from .models import Employee
+
+SNAPSHOT_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "worker_type",
+    "hourly_rate",
+    "daily_rate",
+    "is_active",
+    "hire_date",
+]
+SNAPSHOT_OVERLAP = timedelta(seconds=5)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(count, max_id, last):
+    micros = (last - EPOCH) // MICROSECOND if last is not None else 0
+    return f"{count}.{max_id or 0}.{micros}"
+
+
+def decode_token(token):
+    """``(count, max_id, last updated_at or None)``; raises InvalidToken."""
+    try:
+        count, max_id, micros = (int(part) for part in token.split("."))
+        if min(count, max_id, micros) < 0:
+            raise ValueError
+        last = EPOCH + micros * MICROSECOND if micros else None
+    except (ValueError, OverflowError):
+        raise InvalidToken("Invalid snapshot version.")
+    return count, max_id, last
+
+
+def directory_version(since=None):
+    """
+    ``(count, max id, latest updated_at, employees still present from
+    since)`` in one aggregate query; the last is None without ``since``.
+    """
+    aggregates = {"count": Count("pk"), "max_id": Max("pk"), "last": Max("updated_at")}
+    if since is not None:
+        aggregates["kept"] = Count("pk", filter=Q(pk__lte=since[1]))
+    row = Employee.objects.order_by().aggregate(**aggregates)
+    return row["count"], row["max_id"] or 0, row["last"], row.get("kept")
+
+
+def _column(field, values):
+    if field in ("hourly_rate", "daily_rate"):
+        return [f"{value:.2f}" if value is not None else None for value in values]
+    if field == "hire_date":
+        return [value.isoformat() if value is not None else None for value in values]
+    return list(values)
+
+
+def employee_snapshot(version, since=None):
+    """
+    Snapshot payload at ``version`` (from ``directory_version(since)``),
+    a delta after ``since`` (a decoded token) when that is exact.
+    """
+    count, max_id, last, kept = version
+    queryset = Employee.objects.order_by("id")
+    delta = since is not None and kept == since[0]
+    if delta and since[2] is not None:
+        queryset = queryset.filter(updated_at__gt=since[2] - SNAPSHOT_OVERLAP)
+
+    rows = list(queryset.values_list(*SNAPSHOT_FIELDS))
+    columns = list(zip(*rows)) or [()] * len(SNAPSHOT_FIELDS)
+    return {
+        "version": encode_token(count, max_id, last),
+        "delta": delta,
+        "count": len(rows),
+        "employees": {
+            field: _column(field, values) for field, values in zip(SNAPSHOT_FIELDS, columns)
+        },
+    }
@@ -0,0 +1,52 @@
+# clearops/backend/payroll/streaming.py
+"""
+Streamed response bodies that stay streamed under either server mode.
+
+Django only streams an iterator of the kind the server expects: under ASGI
+it collects a sync iterator into a list before sending anything, and under
+WSGI it does the same with an async one. So:
+
+    streaming_content  -- exports and other sync generators: returned as is
+                          under WSGI, and under ASGI wrapped in an async
+                          iterator pulling about STREAM_CHUNK_BYTES per hop
+                          to the sync thread (where the DB connection lives)
+    is_asgi            -- whether the request came in over ASGI
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def is_asgi(request):
+    # DRF's Request wraps the Django one.
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def _next_chunk(parts):
+    buffer, length = [], 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= STREAM_CHUNK_BYTES:
+            break
+    return b"".join(buffer)
+
+
+async def _async_chunks(parts):
+    parts = iter(parts)
+    next_chunk = sync_to_async(_next_chunk, thread_sensitive=True)
+    try:
+        while chunk := await next_chunk(parts):
+            yield chunk
+    finally:
+        # Closes a generator left open by a disconnected client, and with it
+        # any server-side cursor.
+        close = getattr(parts, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_content(request, parts):
+    """``parts``, a sync iterator of bytes, as the server mode streams it."""
+    return _async_chunks(parts) if is_asgi(request) else parts
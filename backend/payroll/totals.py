@@ -0,0 +1,216 @@
+# clearops/backend/payroll/totals.py
+"""
+Maintenance of the materialized PayrollRunTotals / EmployeePeriodTotals rows.
+
+Write paths in the services layer report which runs and employee-months they
+touched; only those keys are re-aggregated (one grouped query each) and
+upserted, so keeping the totals current costs a couple of statements per
+operation rather than a scan of all work entries.
+
+Months detached into archive tables (payroll.partitions, recorded as
+DetachedMonth) no longer have work entries to aggregate, so the full
+``rebuild_totals`` and ``check_totals`` leave their totals -- those of the
+runs whose period starts in such a month, and the employee-months -- as
+they were when the month was detached.
+"""
+from datetime import date
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import DetachedMonth, EmployeePeriodTotals, PayrollRunTotals, WorkEntry
+
+TOTAL_FIELDS = [
+    "entry_count",
+    "paid_count",
+    "total_hours",
+    "total_days",
+    "total_gross",
+    "total_net",
+]
+
+
+def _aggregates():
+    zero = Value(Decimal("0.00"))
+    return {
+        "entry_count": Count("id"),
+        "paid_count": Count("id", filter=Q(is_paid=True)),
+        "total_hours": Coalesce(Sum("hours_worked"), zero),
+        "total_days": Coalesce(Sum("days_worked"), zero),
+        "total_gross": Coalesce(Sum("gross_pay"), zero),
+        "total_net": Coalesce(Sum("net_pay"), zero),
+    }
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def touched_keys(entries):
+    """
+    Returns ``(run_ids, employee_months)`` for an iterable of work entries or
+    of ``(employee_id, payroll_run_id, payroll_period_start)`` tuples.
+    """
+    run_ids, employee_months = set(), set()
+    for entry in entries:
+        if isinstance(entry, WorkEntry):
+            entry = (entry.employee_id, entry.payroll_run_id, entry.payroll_period_start)
+        employee_id, run_id, period_start = entry
+        if run_id is not None:
+            run_ids.add(run_id)
+        employee_months.add((employee_id, month_of(period_start)))
+    return run_ids, employee_months
+
+
+def detached_months():
+    return list(DetachedMonth.objects.values_list("month", flat=True))
+
+
+def _within(field, months):
+    """Q matching rows whose date ``field`` falls in one of ``months``."""
+    return reduce(
+        or_,
+        (Q(**{f"{field}__gte": month, f"{field}__lt": _next_month(month)}) for month in months),
+    )
+
+
+def _run_totals_rows(run_ids=None, detached=()):
+    entries = WorkEntry.objects.filter(payroll_run__isnull=False)
+    if run_ids is not None:
+        entries = entries.filter(payroll_run_id__in=run_ids)
+    if detached:
+        entries = entries.exclude(_within("payroll_run__payroll_period_start", detached))
+    return entries.values("payroll_run_id").annotate(**_aggregates()).order_by()
+
+
+def _employee_totals_rows(employee_months=None, detached=()):
+    entries = WorkEntry.objects.all()
+    if detached:
+        entries = entries.exclude(_within("payroll_period_start", detached))
+    if employee_months is not None:
+        months = {month for _, month in employee_months}
+        entries = entries.filter(
+            employee_id__in={employee_id for employee_id, _ in employee_months},
+            payroll_period_start__gte=min(months),
+            payroll_period_start__lt=_next_month(max(months)),
+        )
+    return (
+        entries.annotate(month=TruncMonth("payroll_period_start"))
+        .values("employee_id", "month")
+        .annotate(**_aggregates())
+        .order_by()
+    )
+
+
+def refresh_run_totals(run_ids):
+    run_ids = set(run_ids) - {None}
+    if not run_ids:
+        return
+    rows = list(_run_totals_rows(run_ids))
+    PayrollRunTotals.objects.bulk_create(
+        [PayrollRunTotals(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=["payroll_run"],
+        update_fields=TOTAL_FIELDS + ["updated_at"],
+    )
+    emptied = run_ids - {row["payroll_run_id"] for row in rows}
+    if emptied:
+        PayrollRunTotals.objects.filter(payroll_run_id__in=emptied).delete()
+
+
+def refresh_employee_totals(employee_months):
+    employee_months = set(employee_months)
+    if not employee_months:
+        return
+    rows = list(_employee_totals_rows(employee_months))
+    EmployeePeriodTotals.objects.bulk_create(
+        [EmployeePeriodTotals(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=["employee", "month"],
+        update_fields=TOTAL_FIELDS + ["updated_at"],
+    )
+    emptied = employee_months - {(row["employee_id"], row["month"]) for row in rows}
+    if emptied:
+        EmployeePeriodTotals.objects.filter(
+            reduce(or_, (Q(employee_id=e, month=m) for e, m in emptied))
+        ).delete()
+
+
+def refresh_totals(run_ids=(), employee_months=()):
+    refresh_run_totals(run_ids)
+    refresh_employee_totals(employee_months)
+
+
+def refresh_totals_for(entries):
+    """Refreshes the totals touched by the given entries (see touched_keys)."""
+    refresh_totals(*touched_keys(entries))
+
+
+def _stored_totals(detached):
+    """The stored totals ``rebuild_totals`` and ``check_totals`` work on."""
+    runs, months = PayrollRunTotals.objects.all(), EmployeePeriodTotals.objects.all()
+    if detached:
+        runs = runs.exclude(_within("payroll_run__payroll_period_start", detached))
+        months = months.exclude(month__in=detached)
+    return runs, months
+
+
+def rebuild_totals():
+    """Recomputes every totals row from the work entries, but detached months'."""
+    detached = detached_months()
+    runs, months = _stored_totals(detached)
+    runs.delete()
+    months.delete()
+    PayrollRunTotals.objects.bulk_create(
+        (PayrollRunTotals(**row) for row in _run_totals_rows(detached=detached)),
+        batch_size=1000,
+    )
+    EmployeePeriodTotals.objects.bulk_create(
+        (EmployeePeriodTotals(**row) for row in _employee_totals_rows(detached=detached)),
+        batch_size=1000,
+    )
+
+
+def _diff(expected_rows, stored, key):
+    mismatches = []
+    for row in expected_rows:
+        k = key(row)
+        values = {f: row[f] for f in TOTAL_FIELDS}
+        if stored.pop(k, None) != values:
+            mismatches.append(k)
+    # Stored rows with no entries behind them are stale too.
+    return mismatches + list(stored)
+
+
+def check_totals():
+    """
+    Compares the stored totals with a fresh aggregation and returns the keys
+    that differ: ``{"runs": [...], "employee_months": [...]}``. Detached
+    months are not checked.
+    """
+    detached = detached_months()
+    runs, months = _stored_totals(detached)
+    stored_runs = {
+        row.pop("payroll_run_id"): row for row in runs.values("payroll_run_id", *TOTAL_FIELDS)
+    }
+    stored_months = {
+        (row.pop("employee_id"), row.pop("month")): row
+        for row in months.values("employee_id", "month", *TOTAL_FIELDS)
+    }
+    return {
+        "runs": _diff(
+            _run_totals_rows(detached=detached), stored_runs, lambda r: r["payroll_run_id"]
+        ),
+        "employee_months": _diff(
+            _employee_totals_rows(detached=detached),
+            stored_months,
+            lambda r: (r["employee_id"], r["month"]),
+        ),
+    }
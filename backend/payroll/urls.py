@@ -2,16 +2,22 @@ from rest_framework import routers
 from django.urls import path, include
 
 from .views import (
+    DeductionRuleViewSet,
+    PayrollAuditEventViewSet,
     EmployeeViewSet,
     WorkEntryViewSet,
     BulkWorkEntryCreateView,
     PayrollRunViewSet,
+    PayrollAnalyticsView,
+    PayrollSimulationView,
 )
 
 router = routers.DefaultRouter()
 router.register(r"employees", EmployeeViewSet)
 router.register(r"workentries", WorkEntryViewSet)
 router.register(r"payroll-runs", PayrollRunViewSet)
+router.register(r"deduction-rules", DeductionRuleViewSet)
+router.register(r"audit-events", PayrollAuditEventViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -20,4 +26,6 @@ urlpatterns = [
         BulkWorkEntryCreateView.as_view(),
         name="bulk-work-entry-create",
     ),
+    path("analytics/", PayrollAnalyticsView.as_view(), name="payroll-analytics"),
+    path("simulations/", PayrollSimulationView.as_view(), name="payroll-simulation"),
 ]
@@ -1,99 +1,526 @@
 from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Sum, Value
+from django.http import StreamingHttpResponse
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework import viewsets, filters, status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .analytics import labour_cost_report, report_versions
+from .conditional import (
+    ConditionalGetMixin,
+    conditional_response,
+    table_version,
+    write_version,
+)
+from .exports import (
+    EXPORT_FORMATS,
+    BankExportRenderer,
+    CSVExportRenderer,
+    XLSXExportRenderer,
+)
+from .filters import FieldFilterBackend
+from .idempotency import idempotent, request_stream
+from .ingest import (
+    INGEST_BATCH_SIZE,
+    InvalidRow,
+    ingest_work_entries,
+    iter_csv_rows,
+    iter_ndjson_rows,
+)
+from .jobs import batch_status, enqueue_close, enqueue_closes, load_progress, runs_to_close
+from .pagination import AuditEventPagination, KeysetPagination
+from .rates import RateConflict, effective_rates, rate_columns
+from .simulation import simulate_payroll
+from .snapshot import InvalidToken, decode_token, directory_version, employee_snapshot
+from .streaming import streaming_content
+from .services import (
+    PayrollError,
+    add_employee_rate,
+    delete_with_entries,
+    delete_work_entry,
+    save_work_entries,
+)
+from .models import (
+    DeductionRule,
+    Employee,
+    WorkEntry,
+    PayrollAuditEvent,
+    PayrollCloseBatch,
+    PayrollRun,
+    PayrollRunTotals,
+)
+from .serializers import (
+    DeductionRuleSerializer,
+    EmployeeSerializer,
+    EmployeeRateSerializer,
+    WorkEntrySerializer,
+    WorkEntryListSerializer,
+    PayrollRunSerializer,
+    PayrollRunCreateSerializer,
+    PayrollCloseJobSerializer,
+    PayrollBatchCloseSerializer,
+    PayrollAnalyticsQuerySerializer,
+    PayrollSimulationSerializer,
+    PayrollAuditEventSerializer,
+    EmployeePeriodTotalsSerializer,
+)
+
+
+# Columns WorkEntryListSerializer never reads; skipped when loading list pages.
+WORK_ENTRY_LIST_DEFERRED = [
+    "created_at",
+    "employee__hourly_rate",
+    "employee__daily_rate",
+    "employee__is_active",
+    "employee__hire_date",
+]
+
+
+class CurrentRatesMixin:
+    """Brings scheduled rates that have taken effect into the employee columns."""
 
-from .services import calculate_payroll
-from .models import Employee, WorkEntry, PayrollRun
-from .serializers import EmployeeSerializer, WorkEntrySerializer, PayrollRunSerializer, PayrollRunCreateSerializer
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        rate_columns.ensure_current()
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(CurrentRatesMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
-    search_fields = ["first_name", "last_name"]
-    filterset_fields = ["worker_type", "is_active", "date_joined"]
-    ordering_fields = ["first_name", "last_name", "hourly_rate", "date_joined"]
-    ordering = ["-date_joined"]
+    filter_backends = [FieldFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_fields = {"worker_type": "worker_type", "is_active": "is_active"}
+    search_fields = ["^first_name", "^last_name"]
+    ordering_fields = ["first_name", "last_name", "hourly_rate", "hire_date"]
+    ordering = ["-hire_date", "-id"]
+
+    def get_list_versions(self):
+        return [write_version(Employee)]
+
+    def get_object_versions(self, pk):
+        return Employee.objects.filter(pk=pk).values_list("updated_at").first()
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except RateConflict as exc:
+            raise ValidationError({"error": str(exc)})
+
+    def perform_destroy(self, instance):
+        try:
+            delete_with_entries(instance)
+        except PayrollError as exc:
+            raise ValidationError({"error": str(exc)})
+
+    @action(detail=False, methods=["get"])
+    def snapshot(self, request):
+        """
+        The whole directory as parallel arrays with a version token;
+        ``?since=<version>`` returns only what changed after it.
+        """
+        since = request.query_params.get("since")
+        try:
+            since = decode_token(since) if since else None
+        except InvalidToken as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        version = directory_version(since)
+        return conditional_response(
+            request, [version], lambda: Response(employee_snapshot(version, since))
+        )
+
+    @action(detail=True, methods=["get"])
+    def totals(self, request, pk=None):
+        """Monthly and year-to-date totals from the materialized totals table."""
+        employee = self.get_object()
+        try:
+            year = int(request.query_params.get("year", timezone.now().year))
+        except ValueError:
+            return Response({"error": "year must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        months = employee.period_totals.filter(month__year=year).order_by("month")
+        ytd = months.aggregate(
+            entry_count=Coalesce(Sum("entry_count"), Value(0)),
+            total_gross=Coalesce(Sum("total_gross"), Value(Decimal("0.00"))),
+            total_net=Coalesce(Sum("total_net"), Value(Decimal("0.00"))),
+        )
+        return Response(
+            {
+                "employee_id": employee.id,
+                "year": year,
+                "months": EmployeePeriodTotalsSerializer(months, many=True).data,
+                "year_to_date": {
+                    "entry_count": ytd["entry_count"],
+                    "total_gross": f"{ytd['total_gross']:.2f}",
+                    "total_net": f"{ytd['total_net']:.2f}",
+                },
+            }
+        )
 
+    @action(detail=True, methods=["get", "post"])
+    def rates(self, request, pk=None):
+        """
+        GET: the employee's rate history, or with ``?on=YYYY-MM-DD`` the rate
+        in effect on that date. POST: record a new effective-dated rate.
+        """
+        employee = self.get_object()
+        if request.method == "POST":
+            serializer = EmployeeRateSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                add_employee_rate(employee, serializer)
+            except PayrollError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class WorkEntryViewSet(viewsets.ModelViewSet):
-    queryset = WorkEntry.objects.all()
+        on = request.query_params.get("on")
+        if on is None:
+            return Response(
+                EmployeeRateSerializer(employee.rate_history.all(), many=True).data
+            )
+        try:
+            on = datetime.strptime(on, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "on must be a date (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        rate = effective_rates([employee.pk], on).first()
+        if rate is None:
+            return Response({"error": "No rate recorded for this employee."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(EmployeeRateSerializer(rate).data)
+
+
+class WorkEntryViewSet(CurrentRatesMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = WorkEntry.objects.select_related("employee")
     serializer_class = WorkEntrySerializer
-    filter_backends = [
-        filters.SearchFilter,
-        filters.OrderingFilter,
-    ]
-    search_fields = ["employee__first_name", "employee__last_name"]
-    filterset_fields = ["employee", "is_paid", "payment_type", "payroll_period_start"]
-    ordering_fields = ["payroll_period_start", "payroll_period_end", "payment_date"]
-    ordering = ["-payroll_period_start"]
+    pagination_class = KeysetPagination
+    # Ordering is the paginator's (?ordering=payroll_period_start reverses it).
+    filter_backends = [FieldFilterBackend, filters.SearchFilter]
+    filter_fields = {
+        "employee": "employee_id",
+        "payroll_run": "payroll_run_id",
+        "is_paid": "is_paid",
+        "payment_type": "payment_type",
+        "payroll_period_start": "payroll_period_start",
+        "period_start": "payroll_period_start__gte",
+        "period_end": "payroll_period_end__lte",
+    }
+    search_fields = ["^employee__first_name", "^employee__last_name"]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            return queryset.defer(*WORK_ENTRY_LIST_DEFERRED)
+        return queryset
+
+    def get_list_versions(self):
+        # Rows embed employee names, so employee edits count too.
+        return [write_version(WorkEntry), write_version(Employee)]
+
+    def get_object_versions(self, pk):
+        return (
+            WorkEntry.objects.filter(pk=pk)
+            .values_list("updated_at", "employee__updated_at")
+            .first()
+        )
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return WorkEntryListSerializer
+        return WorkEntrySerializer
+
+    def perform_create(self, serializer):
+        save_work_entries(serializer)
+
+    def perform_update(self, serializer):
+        try:
+            save_work_entries(serializer)
+        except PayrollError as exc:
+            raise ValidationError({"error": str(exc)})
+
+    def perform_destroy(self, instance):
+        try:
+            delete_work_entry(instance)
+        except PayrollError as exc:
+            raise ValidationError({"error": str(exc)})
+
+
+class PayrollAnalyticsView(APIView):
+    """
+    Labour cost and headcount grouped by ``?group_by=`` (any of week, month,
+    worker_type, employee, payroll_run) for entries whose period starts in
+    ``?start=``..``?end=`` or ``?year=`` (default: year to date). Optional
+    filters: worker_type, employee, payroll_run, closed. Reports over closed
+    runs only (``?closed=true``) are cached and support conditional GET.
+    """
+
+    def get(self, request):
+        params = PayrollAnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        lookup = dict(params.validated_data)
+
+        def render():
+            return Response(labour_cost_report(**lookup))
+
+        if lookup["closed"] is True:
+            return conditional_response(request, report_versions(), render)
+        return render()
+
+
+class PayrollSimulationView(APIView):
+    """
+    POST ``{"start", "end", "scenarios": [...]}``: gross pay of the entries
+    whose period starts in the range under each scenario, next to the
+    baseline. A scenario may set ``multiplier`` (all rates), ``worker_type``
+    and ``employee`` (``{key: multiplier}``), and ``hours_multiplier``.
+    Read-only; nothing is saved.
+    """
+
+    def post(self, request):
+        serializer = PayrollSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(simulate_payroll(**serializer.validated_data))
+
+
+class DeductionRuleViewSet(viewsets.ModelViewSet):
+    """
+    Deduction and withholding rules, applied in ``order`` when pay is
+    calculated. Changes take effect on the next calculation or close.
+    """
+
+    queryset = DeductionRule.objects.all()
+    serializer_class = DeductionRuleSerializer
+
+
+class PayrollAuditEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The append-only payroll audit log. Filter by ``payroll_run`` or
+    ``employee`` (each served by an index) and page with the keyset cursor.
+    """
+
+    queryset = PayrollAuditEvent.objects.all()
+    serializer_class = PayrollAuditEventSerializer
+    pagination_class = AuditEventPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = {
+        "payroll_run": "payroll_run_id",
+        "employee": "employee_id",
+        "work_entry": "work_entry_id",
+        "action": "action",
+    }
 
 
 class BulkWorkEntryCreateView(generics.CreateAPIView):
+    """
+    Accepts ``{"work_entries": [...]}`` JSON, or streamed NDJSON / CSV bodies
+    which are validated and upserted in batches with a per-row error report.
+    JSON bodies are upserted the same way with ``?mode=upsert``; otherwise
+    a duplicate employee/period fails the request. Send an
+    ``Idempotency-Key`` header to make retries replay the first response.
+    """
     serializer_class = WorkEntrySerializer
     # permission_classes = [IsAuthenticated]
+    streaming_formats = {
+        "application/x-ndjson": iter_ndjson_rows,
+        "application/jsonl": iter_ndjson_rows,
+        "text/csv": iter_csv_rows,
+    }
 
+    @idempotent
     def post(self, request, *args, **kwargs):
+        media_type = request.content_type.split(";")[0].strip().lower()
+        if media_type in self.streaming_formats:
+            return self.stream_ingest(request, self.streaming_formats[media_type])
+
         work_entries_data = request.data.get("work_entries", [])
         if not isinstance(work_entries_data, list):
             return Response(
                 {"error": "work_entries must be a list."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if request.query_params.get("mode") == "upsert":
+            not_object = InvalidRow("Each entry must be an object.")
+            rows = (
+                (number, row if isinstance(row, dict) else not_object)
+                for number, row in enumerate(work_entries_data, start=1)
+            )
+            return self.ingest(request, rows)
 
         serializer = self.get_serializer(data=work_entries_data, many=True)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serialzier)
+        self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data, status=status.HTTP_201_CREATED, headers=headers
         )
 
+    def perform_create(self, serializer):
+        save_work_entries(serializer)
+
+    def stream_ingest(self, request, iter_rows):
+        # Read the raw body lazily; request.data would buffer it all.
+        return self.ingest(request, iter_rows(request_stream(request) or []))
 
-class PayrollRunViewSet(viewsets.ModelViewSet):
+    def ingest(self, request, rows):
+        try:
+            batch_size = int(request.query_params.get("batch_size", INGEST_BATCH_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "batch_size must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        batch_size = min(max(batch_size, 1), INGEST_BATCH_SIZE)
+
+        report = ingest_work_entries(rows, batch_size)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class PayrollRunViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     A viewset that provides the standard actions for PayrollRun
     """
-    queryset = PayrollRun.objects.prefetch_related("work_entries__employee")
+    # Totals are read from the materialized PayrollRunTotals row (one join).
+    queryset = PayrollRun.objects.annotate(
+        entry_count=Coalesce("totals__entry_count", Value(0)),
+        paid_count=Coalesce("totals__paid_count", Value(0)),
+        total_gross=Coalesce("totals__total_gross", Value(Decimal("0.00"))),
+        total_net=Coalesce("totals__total_net", Value(Decimal("0.00"))),
+    )
     serializer_class = PayrollRunSerializer
     # permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # Only the run itself is needed here; skip aggregating its entries.
+        if self.action in ["close", "close_status", "entries", "export"]:
+            return PayrollRun.objects.all()
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.action in ['create']:
             return PayrollRunCreateSerializer
         return PayrollRunSerializer
 
+    def get_list_versions(self):
+        return [
+            table_version(PayrollRun.objects.all()),
+            table_version(PayrollRunTotals.objects.all()),
+        ]
+
+    def get_object_versions(self, pk):
+        # Totals are refreshed on every write to the run's entries.
+        return (
+            PayrollRun.objects.filter(pk=pk)
+            .values_list("is_closed", "updated_at", "totals__updated_at")
+            .first()
+        )
+
+    def is_immutable(self, versions):
+        # Closed runs can be neither updated nor deleted, nor can their
+        # entries (see services.check_entry_writable).
+        return versions[0]
+
+    def perform_destroy(self, instance):
+        try:
+            delete_with_entries(instance)
+        except PayrollError as exc:
+            raise ValidationError({"error": str(exc)})
+
+    @action(detail=True, methods=["get"])
+    def entries(self, request, pk=None):
+        # Not immutable even once closed: rows embed employee names.
+        versions = self.get_object_versions(pk)
+        if versions is not None:
+            versions += (write_version(Employee),)
+
+        def render():
+            if versions is None:
+                self.get_object()  # 404
+            queryset = (
+                WorkEntry.objects.filter(payroll_run_id=pk)
+                .select_related("employee")
+                .defer(*WORK_ENTRY_LIST_DEFERRED)
+            )
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = WorkEntryListSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        if versions is None:
+            return render()
+        return conditional_response(request, versions, render)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        renderer_classes=[CSVExportRenderer, XLSXExportRenderer, BankExportRenderer],
+    )
+    def export(self, request, pk=None):
+        """Streams the run's entries as ``?format=csv`` (default), ``xlsx`` or ``bank``."""
+        payroll_run = self.get_object()
+        stream, content_type, extension = EXPORT_FORMATS[request.accepted_renderer.format]
+        response = StreamingHttpResponse(
+            streaming_content(request, stream(payroll_run)), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="payroll-run-{payroll_run.pk}'
+            f'-{payroll_run.payroll_period_start}.{extension}"'
+        )
+        return response
+
+    def handle_exception(self, exc):
+        if self.action == "export":
+            # Errors (missing run, unknown format) are JSON, not a body the
+            # export renderers cannot encode under a csv/xlsx content type.
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
     @action(detail=True, methods=["post"])
     def close(self, request, pk=None):
         payroll_run = self.get_object()
         if payroll_run.is_closed:
             return Response({"error": "Payroll run is already closed."}, status=status.HTTP_400_BAD_REQUEST)
-            
-         # Fetch all associated work entries
-        work_entries = payroll_run.work_entries.all()
-        if not work_entries.exists():
+        if not payroll_run.work_entries.exists():
             return Response({"error": "No work entries to process."}, status=status.HTTP_400_BAD_REQUEST)
-            
-        for entry in work_entries:
-            if entry.employee.worker_type == 'hourly':
-                rate = entry.employee.hourly_rate or Decimal('0.00')
-                entry.gross_pay = Decimal(entry.hours_worked or 0) * rate
-            elif entry.employee.worker_type == 'daily':
-                rate = entry.employee.daily_rate or Decimal('0.00')
-                entry.gross_pay = Decimal(entry.days_worked or 0) * rate
-            else:
-                entry.gross_pay = Decimal('0.00')
-                
-            ntry.net_pay = entry.gross_pay
-            entry.is_paid = True
-            entry.payment_type = 'bank_transfer'
-            entry.payment_date = timezone.now().date()
-            entry.save()
-        
-        payroll_run.is_closed = True
-        payroll_run.date_processed = timezone.now()
-        payroll_run.save()
-        
-        return Response({"message": "Payroll run closed successfully."}, status=status.HTTP_200_OK)
+
+        job = enqueue_close(payroll_run)
+        return Response(PayrollCloseJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["post"], url_path="close-batch")
+    def close_batch(self, request):
+        """
+        Queues a close job for ``run_ids`` or every open run within
+        ``period_start`` .. ``period_end``, and returns the job ids per run
+        and a ``batch_id``; ``close-batch/<batch_id>/`` reports on them all.
+        """
+        serializer = PayrollBatchCloseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        run_ids = runs_to_close(
+            serializer.validated_data.get("run_ids"),
+            serializer.validated_data.get("period_start"),
+            serializer.validated_data.get("period_end"),
+        )
+        return Response(enqueue_closes(run_ids), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path=r"close-batch/(?P<batch_id>\d+)")
+    def close_batch_status(self, request, batch_id=None):
+        """Status, progress and timing of every run of a close batch, with totals."""
+        batch = PayrollCloseBatch.objects.filter(pk=batch_id).first()
+        if batch is None:
+            return Response({"error": "Close batch not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(batch_status(batch))
+
+    @action(detail=True, methods=["get"], url_path="close-status")
+    def close_status(self, request, pk=None):
+        payroll_run = self.get_object()
+        job = payroll_run.close_jobs.first()
+        if job is None:
+            return Response({"error": "Payroll run has no close job."}, status=status.HTTP_404_NOT_FOUND)
+
+        data = PayrollCloseJobSerializer(load_progress(job)).data
+        if job.status == "succeeded":
+            data["result"] = {"message": "Payroll run closed successfully."}
+        return Response(data, status=status.HTTP_200_OK)
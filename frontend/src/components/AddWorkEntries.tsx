@@ -139,13 +139,21 @@ const AddWorkEntries: React.FC<Props> = ({ currentPayrollRun, onPayrollRunUpdate
       // Submit entries
       await submitWorkEntries(entriesToSubmit);
       setSuccess('Work entries submitted successfully.');
+    } catch (err: any) {
+      setError('Failed to submit work entries.');
+      console.error(err);
+      setSubmitting(false);
+      return;
+    }
 
+    try {
       // Optionally, close payroll run
       await closePayrollRun(currentPayrollRun!.id);
       setSuccess('Payroll run closed successfully.');
       onPayrollRunUpdated(); // Refresh payroll runs or related data
     } catch (err: any) {
-      setError('Failed to submit work entries or close payroll run.');
+      // Failed or timed-out close jobs carry their reason in the message
+      setError(err instanceof Error && err.message ? err.message : 'Failed to close payroll run.');
       console.error(err);
     } finally {
       setSubmitting(false);
@@ -16,9 +16,10 @@ import {
   CircularProgress,
   Box,
   Alert,
+  Button,
 } from '@mui/material';
-import { PayrollRun } from '../types/types';
-import { fetchPayrollRunDetails } from '../services/api';
+import { PayrollRun, WorkEntryRow } from '../types/types';
+import { fetchPayrollRunDetails, fetchPayrollRunEntries, payrollRunExportUrl } from '../services/api';
 
 interface PayrollDetailsProps {
   open: boolean;
@@ -28,6 +29,9 @@ interface PayrollDetailsProps {
 
 const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollRunId }) => {
   const [payrollRun, setPayrollRun] = useState<PayrollRun | null>(null);
+  const [entries, setEntries] = useState<WorkEntryRow[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string>('');
 
@@ -36,8 +40,13 @@ const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollR
       if (payrollRunId === null) return;
       setLoading(true);
       try {
-        const data = await fetchPayrollRunDetails(payrollRunId);
+        const [data, page] = await Promise.all([
+          fetchPayrollRunDetails(payrollRunId),
+          fetchPayrollRunEntries(payrollRunId),
+        ]);
         setPayrollRun(data);
+        setEntries(page.results);
+        setNextPage(page.next);
       } catch (err) {
         setError('Failed to fetch payroll run details.');
         console.error(err);
@@ -51,8 +60,25 @@ const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollR
     }
   }, [open, payrollRunId]);
 
+  const handleLoadMore = async () => {
+    if (payrollRunId === null || !nextPage) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPayrollRunEntries(payrollRunId, nextPage);
+      setEntries((prev) => [...prev, ...page.results]);
+      setNextPage(page.next);
+    } catch (err) {
+      setError('Failed to fetch more work entries.');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleClose = () => {
     setPayrollRun(null);
+    setEntries([]);
+    setNextPage(null);
     setError('');
     onClose();
   };
@@ -89,6 +115,20 @@ const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollR
             <Typography variant="subtitle1" gutterBottom>
               Notes: {payrollRun.notes || 'N/A'}
             </Typography>
+            <Typography variant="subtitle1" gutterBottom>
+              Entries: {payrollRun.entry_count} ({payrollRun.paid_count} paid) | Total Gross: ${payrollRun.total_gross} | Total Net: ${payrollRun.total_net}
+            </Typography>
+            <Box display="flex" gap={1} mt={1}>
+              <Button size="small" variant="outlined" href={payrollRunExportUrl(payrollRun.id, 'csv')}>
+                Export CSV
+              </Button>
+              <Button size="small" variant="outlined" href={payrollRunExportUrl(payrollRun.id, 'xlsx')}>
+                Export XLSX
+              </Button>
+              <Button size="small" variant="outlined" href={payrollRunExportUrl(payrollRun.id, 'bank')}>
+                Bank payout file
+              </Button>
+            </Box>
 
             <Typography variant="h6" gutterBottom style={{ marginTop: '1.5rem' }}>
               Work Entries
@@ -112,20 +152,20 @@ const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollR
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {payrollRun.work_entries.length === 0 ? (
+                  {entries.length === 0 ? (
                     <TableRow>
                       <TableCell colSpan={12} align="center">
                         No work entries found.
                       </TableCell>
                     </TableRow>
                   ) : (
-                    payrollRun.work_entries.map((entry) => (
+                    entries.map((entry) => (
                       <TableRow key={entry.id}>
                         <TableCell>{entry.id}</TableCell>
-                        <TableCell>{`${entry.employee.first_name} ${entry.employee.last_name}`}</TableCell>
+                        <TableCell>{entry.employee_name}</TableCell>
                         <TableCell>
-                          {entry.employee.worker_type.charAt(0).toUpperCase() +
-                            entry.employee.worker_type.slice(1)}
+                          {entry.employee_worker_type.charAt(0).toUpperCase() +
+                            entry.employee_worker_type.slice(1)}
                         </TableCell>
                         <TableCell>{entry.hours_worked ?? '-'}</TableCell>
                         <TableCell>{entry.days_worked ?? '-'}</TableCell>
@@ -149,6 +189,13 @@ const PayrollDetails: React.FC<PayrollDetailsProps> = ({ open, onClose, payrollR
                 </TableBody>
               </Table>
             </TableContainer>
+            {nextPage && (
+              <Box display="flex" justifyContent="center" mt={2}>
+                <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              </Box>
+            )}
           </div>
         ) : (
           <Typography variant="h6" align="center" mt={4}>
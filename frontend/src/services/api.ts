@@ -1,24 +1,52 @@
 import axios from 'axios';
-import { Employee, PayrollRun, WorkEntry } from '../types/types';
+import { Employee, EmployeeSnapshot, Page, PayrollCloseJob, PayrollRun, WorkEntry, WorkEntryRow } from '../types/types';
 
 const api = axios.create({
   baseURL: '/api',
   withCredentials: true,
 });
 
-export const fetchEmployees = async (): Promise<Employee[]> => {
-  const response = await api.get<Employee[]>('/employees/');
+// Fetch the employee directory snapshot; with `since`, only what changed after that version
+export const fetchEmployeeSnapshot = async (since?: string): Promise<EmployeeSnapshot> => {
+  const response = await api.get<EmployeeSnapshot>('/employees/snapshot/', {
+    params: since ? { since } : undefined,
+  });
   return response.data;
 };
 
-// Fetch all active employees
-export const fetchActiveEmployees = async (): Promise<Employee[]> => {
-  const response = await api.get<Employee[]>('/employees/', {
-    params: { is_active: true },
+// Directory kept between page loads and brought up to date with snapshot deltas
+let directory: { version: string; employees: Map<number, Employee> } | null = null;
+
+const loadDirectory = async (): Promise<Employee[]> => {
+  const snapshot = await fetchEmployeeSnapshot(directory?.version);
+  const employees = snapshot.delta && directory ? directory.employees : new Map<number, Employee>();
+  const columns = snapshot.employees;
+  const rate = (value: string | null) => (value === null ? undefined : Number(value));
+  columns.id.forEach((id, i) => {
+    employees.set(id, {
+      id,
+      first_name: columns.first_name[i],
+      last_name: columns.last_name[i],
+      worker_type: columns.worker_type[i],
+      hourly_rate: rate(columns.hourly_rate[i]),
+      daily_rate: rate(columns.daily_rate[i]),
+      is_active: columns.is_active[i],
+      hire_date: columns.hire_date[i],
+    });
   });
-  return response.data;
+  directory = { version: snapshot.version, employees };
+  // Same order as the employee list endpoint: newest hires first
+  return [...employees.values()].sort(
+    (a, b) => b.hire_date.localeCompare(a.hire_date) || b.id - a.id,
+  );
 };
 
+export const fetchEmployees = async (): Promise<Employee[]> => loadDirectory();
+
+// Fetch all active employees
+export const fetchActiveEmployees = async (): Promise<Employee[]> =>
+  (await loadDirectory()).filter((employee) => employee.is_active);
+
 // Add a new employee
 export const addEmployee = async (employee: Partial<Employee>): Promise<Employee> => {
   const response = await api.post<Employee>('/employees/', employee);
@@ -54,13 +82,47 @@ export const createPayrollRun = async (payrollRunData: Partial<PayrollRun>): Pro
   return response.data;
 };
 
-// Close a payroll run
-export const closePayrollRun = async (payrollRunId: number): Promise<{ message: string }> => {
-  const response = await api.post<{ message: string }>(`/payroll-runs/${payrollRunId}/close/`);
+// Fetch the progress of a payroll run's latest close job
+export const fetchCloseStatus = async (payrollRunId: number): Promise<PayrollCloseJob> => {
+  const response = await api.get<PayrollCloseJob>(`/payroll-runs/${payrollRunId}/close-status/`);
   return response.data;
 };
 
+// Close a payroll run: the close runs in the background, so poll until it finishes,
+// giving up after timeoutMs (the job may still finish; its status can be checked later)
+export const closePayrollRun = async (
+  payrollRunId: number,
+  pollIntervalMs = 1000,
+  timeoutMs = 10 * 60 * 1000,
+): Promise<{ message: string }> => {
+  await api.post<PayrollCloseJob>(`/payroll-runs/${payrollRunId}/close/`);
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const job = await fetchCloseStatus(payrollRunId);
+    if (job.status === 'succeeded') {
+      return job.result ?? { message: 'Payroll run closed successfully.' };
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Failed to close payroll run.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+  }
+  throw new Error('Closing the payroll run is taking too long; check its status again later.');
+};
+
 export const fetchPayrollRunDetails = async (id: number): Promise<PayrollRun> => {
   const response = await api.get<PayrollRun>(`/payroll-runs/${id}/`);
   return response.data;
-};
\ No newline at end of file
+};
+
+// Fetch one page of a payroll run's work entries; pass the previous page's `next` URL to continue
+export const fetchPayrollRunEntries = async (id: number, next?: string | null): Promise<Page<WorkEntryRow>> => {
+  const response = next
+    ? await axios.get<Page<WorkEntryRow>>(next, { withCredentials: true })
+    : await api.get<Page<WorkEntryRow>>(`/payroll-runs/${id}/entries/`);
+  return response.data;
+};
+
+// Download URL of a payroll run export; the server streams the file
+export const payrollRunExportUrl = (id: number, format: 'csv' | 'xlsx' | 'bank'): string =>
+  `/api/payroll-runs/${id}/export/?format=${format}`;
@@ -9,6 +9,23 @@ export interface Employee {
     hire_date: string;
 }
 
+// Employee directory as parallel arrays (GET /employees/snapshot/)
+export interface EmployeeSnapshot {
+  version: string;
+  delta: boolean;
+  count: number;
+  employees: {
+    id: number[];
+    first_name: string[];
+    last_name: string[];
+    worker_type: Array<'hourly' | 'daily'>;
+    hourly_rate: Array<string | null>;
+    daily_rate: Array<string | null>;
+    is_active: boolean[];
+    hire_date: string[];
+  };
+}
+
 export interface PayrollRun {
   id: number;
   payroll_period_start: string;
@@ -18,7 +35,35 @@ export interface PayrollRun {
   date_created: string;
   is_closed: boolean;
   notes?: string;
-  work_entries: WorkEntry[];
+  entry_count: number;
+  paid_count: number;
+  total_gross: string;
+  total_net: string;
+}
+
+// Compact work entry row returned by list endpoints
+export interface WorkEntryRow {
+  id: number;
+  employee_id: number;
+  employee_name: string;
+  employee_worker_type: 'hourly' | 'daily';
+  payroll_run?: number;
+  payroll_period_start: string;
+  payroll_period_end: string;
+  hours_worked?: string | null;
+  days_worked?: string | null;
+  is_paid: boolean;
+  payment_type?: string | null;
+  payment_date?: string | null;
+  notes?: string | null;
+  gross_pay: string;
+  total_deductions: string;
+  net_pay: string;
+}
+
+export interface Page<T> {
+  next: string | null;
+  results: T[];
 }
 
 export interface WorkEntry {
@@ -36,4 +81,17 @@ export interface WorkEntry {
   gross_pay?: number;
   total_deductions?: number;
   net_pay?: number;
-}
\ No newline at end of file
+}
+
+export interface PayrollCloseJob {
+  job_id: number;
+  payroll_run: number;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  entries_processed: number;
+  entries_total: number;
+  error?: string | null;
+  created_at: string;
+  started_at?: string | null;
+  finished_at?: string | null;
+  result?: { message: string };
+}